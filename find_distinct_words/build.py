@@ -1,11 +1,17 @@
 import os
-import pickle
+import copy
+import json
 import numpy as np
+from scipy.stats import spearmanr
+from functools import partial
+from multiprocessing import Pool
 import gensim
 from gensim.models.keyedvectors import KeyedVectors as kv
 from find_distinct_words import common_func
-from find_distinct_words import tensorly_modified
-from collections import Counter
+from find_distinct_words import cache
+from find_distinct_words import cp_als
+from find_distinct_words import ppmi
+from find_distinct_words import cooccur
 
 
 '''
@@ -15,26 +21,40 @@ from collections import Counter
 
 This code generates ja & ko word2vec models using the filtered k-pop/j-pop files:
 
---- 'filtered_lyrics/lyrics_ja.p' file
---- 'filtered_lyrics/lyrics_ko.p' file
+--- 'filtered_lyrics/lyrics_ja.{vocab,ids,offsets}' files
+--- 'filtered_lyrics/lyrics_ko.{vocab,ids,offsets}' files
 
 This code outputs 10 different J-pop/K-pop word2vec models:
 
 --- 'word2vec/w2v_ja_{}.kv' ({}: 0-9)
 --- 'word2vec/w2v_ko_{}.kv' ({}: 0-9)
 
+or, with the 'ppmi' embedding, 10 different J-pop/K-pop PPMI-SVD vectors (see 'ppmi.py'):
+
+--- 'word2vec/ppmi_ja_{}.kv' ({}: 0-9)
+--- 'word2vec/ppmi_ko_{}.kv' ({}: 0-9)
+
 This code outputs 10 different ja, ko, neu's sorted CPD word lists:
 
 --- 'cpd_result/ja_{}.txt' ({}: 0-9)
 --- 'cpd_result/ko_{}.txt' ({}: 0-9)
 --- 'cpd_result/neu_{}.txt' ({}: 0-9)
 
+and the factors of the 10 CP decompositions (used to warm-start the next build):
+
+--- 'cpd_result/factors_{}.npz' ({}: 0-9)
+
 This code also outputs the merged(summed) CPD word lists:
 
 --- 'cpd_result/ja.txt'
 --- 'cpd_result/ko.txt'
 --- 'cpd_result/neu.txt'
 
+and, if the word2vec models are trained with multiple threads, the stability check
+of the word lists (see 'check_workers()'):
+
+--- 'cpd_result/workers_check.json'
+
 '''
 
 # Define new hash function for reproducibility.
@@ -52,50 +72,107 @@ def new_hash(selected):
 builds two word2vec models, one for j-pop and one for k-pop, and 
 saves the model to file.
 
+the filtered lyrics data can be passed as a (lyrics_ja, lyrics_ko) tuple
+to avoid reloading it from disk for every seed.
+
+'size' is the dimensionality of the word vectors.
+
+'workers' is the number of word2vec training threads. the models are only
+reproducible with a single thread; with more threads, the stability of the
+resulting word lists can be checked with 'check_workers()'.
+
+'''
+
+def word2vec(seed=2018, lyrics_xy=None, size=5, workers=1):
+    # Create 'word2vec' directory if there isn't any; the seed worker processes
+    # may create it at the same time.
+
+    word2vec_dir = "word2vec"
+    os.makedirs(word2vec_dir, exist_ok=True)
+
+    model_ja, model_ko = _train_word2vec(seed, lyrics_xy=lyrics_xy, size=size, workers=workers)
+
+    # Save word2vec model with '.kv' extension ('kv' stands for 'keyvector').
+    # The vectors are saved to a separate '.kv.vectors.npy' file, so that they
+    # can be memory-mapped by 'CPD_wordlist()' (see 'block_rows').
+
+    model_ja.wv.save("word2vec/w2v_ja_{}.kv".format(str(seed)), separately=['vectors'])
+    model_ko.wv.save("word2vec/w2v_ko_{}.kv".format(str(seed)), separately=['vectors'])
+
+
+'''
+
+|++++++++++++++++++++++++++++++++++++|
+| ppmi_embedding(seed, size, window) |
+|++++++++++++++++++++++++++++++++++++|
+
+builds J-pop & K-pop word vectors from the PPMI matrices of the filtered lyrics
+(see 'ppmi.py'), an alternative to the word2vec vectors of 'word2vec()', and saves them
+in the same format ('word2vec/ppmi_ja_{seed}.kv' & 'word2vec/ppmi_ko_{seed}.kv').
+
+the vectors are deterministic; the seed only sets the starting vector of the SVD solver,
+which does not change the vectors.
+
+the counts of the filtered lyrics data (see 'cooccur.count_corpus()') can be passed
+as 'corpus' to avoid counting them for every seed; 'window' is then not used.
+
 '''
 
-def word2vec(seed=2018):
+def ppmi_embedding(seed=2018, size=5, window=5, corpus=None):
     # Create 'word2vec' directory if there isn't any.
 
     word2vec_dir = "word2vec"
-    if not os.path.exists(word2vec_dir):
-        os.makedirs(word2vec_dir)
+    os.makedirs(word2vec_dir, exist_ok=True)
 
+    if corpus is None:
+        corpus = cooccur.count_corpus(window=window)
+
+    vectors_ja, vectors_ko = ppmi.ppmi_vectors([corpus['cooccur_ja'], corpus['cooccur_ko']],
+                                               size=size, random_state=seed)
+
+    for c, vectors in (("ja", vectors_ja), ("ko", vectors_ko)):
+        kv_c = kv(size)
+        kv_c.add(list(corpus['vocab']), vectors)
+        kv_c.save("word2vec/ppmi_{}_{}.kv".format(c, str(seed)), separately=['vectors'])
+
+
+def _train_word2vec(seed, lyrics_xy=None, size=5, workers=1):
     # Load filtered lyrics data.
 
-    lyrics_ja, lyrics_ko, label = common_func.load_xy()
+    if lyrics_xy is None:
+        lyrics_ja, lyrics_ko, label = common_func.load_xy()
+    else:
+        lyrics_ja, lyrics_ko = lyrics_xy
 
     # Merge lyrics_ja & lyrics_ko lyrics.
 
     lyrics = lyrics_ja + lyrics_ko
 
-    # ------------------------------------------------------------------
-    # Build J-pop word2vec model.
-    # ------------------------------------------------------------------
     # Train word2vec model using both lyrics_ja & lyrics_ko data.
+    # The J-pop & K-pop models start from the same trained model, so it is trained once
+    # and copied. The copy includes the random state of the model, hence the retrained
+    # models are the same as those retrained from two separately trained models.
 
-    model_ja = gensim.models.Word2Vec(lyrics, size=5, window=5, min_count=1,
-                                      workers=1, seed=seed, hashfxn=new_hash)
+    model_base = gensim.models.Word2Vec(lyrics, size=size, window=5, min_count=1,
+                                        workers=workers, seed=seed, hashfxn=new_hash)
 
+    # ------------------------------------------------------------------
+    # Build J-pop word2vec model.
+    # ------------------------------------------------------------------
     # Retrain word2vec model using only lyrics_ja data to create J-pop word2vec model.
 
+    model_ja = copy.deepcopy(model_base)
     model_ja.train(lyrics_ja, total_examples=len(lyrics_ja), epochs=50)
 
     # ------------------------------------------------------------------
     # Build K-pop word2vec model.
     # ------------------------------------------------------------------
-    # Train word2vec model using both lyrics_ja & lyrics_ko data.
-
-    model_ko = gensim.models.Word2Vec(lyrics, size=5, window=5, min_count=1,
-                                      workers=1, seed=seed, hashfxn=new_hash)
-
     # Retrain word2vec model using only lyrics_ko data to create K-pop word2vec model.
-    model_ko.train(lyrics_ko, total_examples=len(lyrics_ko), epochs=50)
 
-    # Save word2vec model with '.kv' extension ('kv' stands for 'keyvector').
+    model_ko = model_base
+    model_ko.train(lyrics_ko, total_examples=len(lyrics_ko), epochs=50)
 
-    model_ja.wv.save("word2vec/w2v_ja_{}.kv".format(str(seed)))
-    model_ko.wv.save("word2vec/w2v_ko_{}.kv".format(str(seed)))
+    return model_ja, model_ko
 
 
 '''
@@ -104,146 +181,717 @@ def word2vec(seed=2018):
 | CPD_wordlist() |
 |++++++++++++++++|
 
-builds rank-3 mode-3 CP decomposition tensor using fixed mode-3 values by
-importing the 'tensorly_modified' code that modifies the 'tensorly' library.
-
-this modified code performs a fixed mode-3 value CP decomposition.
+builds rank-3 (rank K + 1 for K corpora) mode-3 CP decomposition tensor using fixed mode-3 values, i.e.,
+the fixed mode-3 value CP decomposition of the 'tensorly_modified' code that
+modifies the 'tensorly' library.
 
 from the decomposition results, mode-1 vectors are used to sort the index words.
 
 the sorted index words are saved to the 'cpd_result' directory.
 
+'w_jako' is the mode-3 weight of the J-pop/K-pop components; the
+neutral component is weighted 1 - w_jako.
+
+'embedding' is the name of the word vectors: 'w2v' for those of 'word2vec()', and
+'ppmi' for those of 'ppmi_embedding()'.
+
+'corpora' are the names of the word vectors ('word2vec/{embedding}_{corpus}_{seed}.kv') that
+are decomposed together; their rows are aligned by vocabulary ID (see '_aligned_rows()'). K corpora are
+decomposed at once into K + 1 components, one per corpus and a shared neutral component
+(see 'cp_als.fixed_mode_three()'), and the sorted index words of each component are saved
+to 'cpd_result/{component}_{seed}.txt' (see '_components()').
+
+'engine' selects the CP decomposition code (see '_parafac()'):
+
+--- 'numpy' : NumPy port of 'tensorly_modified.py' with the same results ('cp_als.py').
+--- 'tensorly' : 'tensorly_modified.py'.
+--- 'cp_als' : 'cp_als.py', which computes the reconstruction error without
+               reconstructing the tensor.
+
+if 'constrained' is True, the fixed mode-3 factor is not updated; the word lists are the
+same as without it (see 'check_constrained()'), but the saved mode-3 factor is the fixed one.
+
+the factors are saved to 'cpd_result/factors_{seed}.npz' together with the index words.
+if 'warm_start' is True, the decomposition starts from the saved factors of the previous
+run of the seed (see '_warm_start_factors()') instead of random factors.
+
+with the 'numpy' & 'cp_als' engines, the per-iteration telemetry of the decomposition
+(reconstruction error and wall times, see 'cp_als.parafac()') is saved to
+'cpd_result/log_{seed}.json'. if 'rank_stable' is given, the decomposition also stops
+once the top & bottom rank_top words of each component have not changed for rank_stable
+iterations (see 'cp_als.parafac()').
+
+if 'block_rows' is given, the decomposition is computed out of core: the word2vec vectors
+are memory-mapped instead of loaded & stacked, and the aligned rows are read block_rows words
+at a time by 'cp_als.parafac_blocked()' (the 'cp_als' computation; 'engine' is not used).
+
+returns the vocabulary IDs of the index words (see 'common_func.load_index_words()') and
+the transposed mode-1 factor (rows: the components, i.e., 'ja', 'neu', 'ko' by default).
+
 '''
 
-def CPD_wordlist(verbose=True, seed=2018):
+def CPD_wordlist(verbose=True, seed=2018, w_jako=0.5, engine='numpy', constrained=False,
+                 warm_start=False, rank_stable=None, block_rows=None, corpora=('ja', 'ko'),
+                 embedding='w2v', rank_top=50):
+    if engine == 'tensorly' and rank_stable and not block_rows:
+        raise ValueError("rank_stable is not available with the 'tensorly' engine.")
+
     # Create 'cpd_result' directory if there isn't any.
 
     cpd_dir = "cpd_result"
-    if not os.path.exists(cpd_dir):
-        os.makedirs(cpd_dir)
+    os.makedirs(cpd_dir, exist_ok=True)
+
+    # The vectors are memory-mapped in the out-of-core mode.
+
+    mmap = 'r' if block_rows else None
+    kvs = [kv.load('word2vec/{}_{}_{}.kv'.format(embedding, c, str(seed)), mmap=mmap) for c in corpora]
+    print("kv_{}.vectors.shape:".format(corpora[0]), kvs[0].vectors.shape)
+
+    # Align the rows of the vectors by the vocabulary IDs of the index words.
 
-    kv_ja = kv.load('word2vec/w2v_ja_{}.kv'.format(str(seed)))
-    kv_ko = kv.load('word2vec/w2v_ko_{}.kv'.format(str(seed)))
-    print("kv_ja.vectors.shape:", kv_ja.vectors.shape)
+    index_words = common_func.load_index_words()
 
-    X = np.stack((kv_ja.vectors, kv_ko.vectors), axis=2)
-    print("stacked X shape:", X.shape)
+    # In the out-of-core mode, the rows are gathered block by block from the
+    # memory-mapped vectors by 'cp_als.parafac_blocked()' (see 'rows').
 
-    w_jako = 0.5
-    w_neu = 1.0 - w_jako
-    fixed_ja = [w_jako, w_neu, 0.0]  # [0.5, 0.5, 0.0]
-    fixed_ko = [0.0, w_neu, w_jako]  # [0.0, 0.5, 0.5]
+    if block_rows:
+        index_ids, rows = _aligned_rows(kvs, index_words)
+        slices = [kv_c.vectors for kv_c in kvs]
+        shape = (len(index_ids), slices[0].shape[1], len(slices))
+    else:
+        index_ids, vectors = _aligned_vectors(kvs, index_words)
+        X = np.stack(vectors, axis=2)
+        shape = X.shape
+        print("stacked X shape:", X.shape)
 
-    country_values = [fixed_ja, fixed_ko]
+    # [[0.5, 0.5, 0.0], [0.0, 0.5, 0.5]] for 'ja' & 'ko'.
+
+    country_values = cp_als.fixed_mode_three(len(corpora), w_jako)
+    rank = len(corpora) + 1
 
     # It is important to fix the random_state in order to obtain consistent results.
     # Here, consistent results mean consistent direction of mode-1 word ordering.
 
     # To ensure convergence, n_iter_max is set at 300.
 
-    decomposed = tensorly_modified.parafac(X, 3, random_state=2018, n_iter_max=300,
-                                           mode_three_val=country_values, verbose=verbose)
+    parafac = _parafac(engine)
+
+    index_w = [index_words[i] for i in index_ids]
+
+    if warm_start:
+        init = _warm_start_factors(seed, index_w, shape, embedding=embedding, corpora=corpora, w_jako=w_jako)
+    else:
+        init = None
+
+    if engine == 'tensorly' and not block_rows:
+        decomposed = parafac(X, rank, random_state=2018, n_iter_max=300,
+                             mode_three_val=country_values, verbose=verbose, constrained=constrained,
+                             init=init)
+    else:
+        telemetry = []
+        if block_rows:
+            decomposed = cp_als.parafac_blocked(slices, rank, block_rows=block_rows, random_state=2018,
+                                                n_iter_max=300, mode_three_val=country_values,
+                                                verbose=verbose, constrained=constrained, init=init,
+                                                telemetry=telemetry, rank_stable=rank_stable, rank_top=rank_top,
+                                                rows=rows)
+        else:
+            decomposed = parafac(X, rank, random_state=2018, n_iter_max=300,
+                                 mode_three_val=country_values, verbose=verbose, constrained=constrained,
+                                 init=init, telemetry=telemetry, rank_stable=rank_stable, rank_top=rank_top)
+
+        log = {'seed': seed, 'embedding': embedding, 'corpora': list(corpora),
+               'engine': 'blocked' if block_rows else engine, 'block_rows': block_rows,
+               'constrained': constrained, 'warm_start': init is not None,
+               'rank_stable': rank_stable, 'rank_top': rank_top, 'n_iter': len(telemetry),
+               'iterations': telemetry}
+        with open("{}/log_{}.json".format(cpd_dir, seed), 'w') as f:
+            json.dump(log, f, indent=1)
+
+    _save_factors(seed, index_w, decomposed, embedding=embedding, corpora=corpora, w_jako=w_jako)
 
     # Select mode-1 vectors containing values for the index words and transpose it.
 
     result = decomposed[0].T
 
-    index_w = kv_ja.index2word
+    _save_seed_wordlist(index_w, result, seed, components=_components(corpora))
+
+    return index_ids, result
+
+
+
+def _parafac(engine):
+    # The 'tensorly' library is only imported if its engine is selected, since
+    # importing it slows down the start of the build (and of each worker process).
+
+    if engine == 'tensorly':
+        from find_distinct_words import tensorly_modified
+        return tensorly_modified.parafac
+    elif engine == 'cp_als':
+        return cp_als.parafac
+    else:
+        return partial(cp_als.parafac, error='direct')
 
-    country = ["ja", "neu", "ko"]
 
-    output = []
+def _aligned_rows(kvs, index_words):
+    # Align the rows of the keyed vectors by the vocabulary IDs of the index words.
+    # The rows follow the word order of the first keyed vectors, and the index words missing
+    # from any keyed vectors are dropped. Returns the vocabulary IDs and the rows of each
+    # keyed vectors (None if its rows are already aligned).
 
-    for i in range(3):  # i denotes either 'ja', 'neu', 'ko'.
-        val = {}
-        for j in range(len(index_w)):
-            val[index_w[j]] = result[i][j]
-        output.append(val)
+    word_id = {w: i for i, w in enumerate(index_words)}
+    position = np.full((len(kvs), len(index_words)), -1, dtype=np.int64)
+    for k, kv_c in enumerate(kvs):
+        ids = np.array([word_id.get(w, -1) for w in kv_c.index2word], dtype=np.int64)
+        known = ids >= 0
+        position[k, ids[known]] = np.flatnonzero(known)
+        if k == 0:
+            index_ids = ids[known]
 
-        sorted_list = [(k, val[k]) for k in sorted(val, key=val.get, reverse=True)]
-        result_str = ""
-        word_list = []
-        for k, v in sorted_list:
-            result_str += "{}\t{}\n".format(k, v)
-            word_list.append(k)
-        # print(result_str)
+    index_ids = index_ids[(position[:, index_ids] >= 0).all(axis=0)]
+    if len(index_ids) < len(kvs[0].index2word):
+        print("aligned vectors: {} of {} words".format(len(index_ids), len(kvs[0].index2word)))
+
+    rows = []
+    for k, kv_c in enumerate(kvs):
+        rows_c = position[k, index_ids]
+        if len(rows_c) == len(kv_c.vectors) and np.array_equal(rows_c, np.arange(len(rows_c))):
+            rows.append(None)
+        else:
+            rows.append(rows_c)
+
+    return index_ids, rows
+
+
+def _aligned_vectors(kvs, index_words):
+    # Reindex the vectors of the keyed vectors against the vocabulary IDs of the index words
+    # (see '_aligned_rows()'). The vectors are gathered at once, or used as they are if their
+    # rows are already aligned.
+
+    index_ids, rows = _aligned_rows(kvs, index_words)
+    vectors = [kv_c.vectors if rows_c is None else kv_c.vectors[rows_c] for kv_c, rows_c in zip(kvs, rows)]
+
+    return index_ids, vectors
+
+
+def _save_factors(seed, index_w, factors, embedding='w2v', corpora=('ja', 'ko'), w_jako=0.5):
+    # Save the factors of the decomposition with the index words (the rows of the mode-1 factor),
+    # and the word vectors & mode-3 values they were computed from (see '_warm_start_factors()').
+
+    np.savez("cpd_result/factors_{}.npz".format(seed), words=np.array(index_w),
+             factor_1=np.asarray(factors[0]), factor_2=np.asarray(factors[1]), factor_3=np.asarray(factors[2]),
+             embedding=embedding, corpora=np.array(corpora), w_jako=w_jako)
+
+
+'''
+
+|++++++++++++++++++++++++++++++++++++++++++++++++|
+| _warm_start_factors(seed, index_w, shape, ...) |
+|++++++++++++++++++++++++++++++++++++++++++++++++|
+
+returns the initial factors of the decomposition of a tensor of the given shape using the saved factors
+of the previous run of the seed ('cpd_result/factors_{seed}.npz').
+
+the mode-1 rows are matched to the index words by word; the rows of the words that
+were not in the previous run are initialized randomly as usual (random_state=2018).
+
+returns None (i.e., random factors) if there are no saved factors, if they were computed
+from other word vectors or mode-3 values (a different 'embedding', 'corpora' or 'w_jako'),
+or if the shapes of the mode-2/mode-3 factors changed (e.g., a different word2vec 'size').
+
+'''
+
+def _warm_start_factors(seed, index_w, shape, embedding='w2v', corpora=('ja', 'ko'), w_jako=0.5):
+    factor_file = "cpd_result/factors_{}.npz".format(seed)
+    if not os.path.exists(factor_file):
+        return None
+
+    saved = np.load(factor_file)
+    if 'embedding' not in saved or (str(saved['embedding']), list(saved['corpora']), float(saved['w_jako'])) != \
+            (embedding, list(corpora), float(w_jako)):
+        print("warm start: the saved factors of seed {} are of another embedding, corpora or w_jako; "
+              "not used.".format(seed))
+        return None
+
+    init = cp_als.random_factors(shape, shape[2] + 1, random_state=2018)
+    if saved['factor_2'].shape != init[1].shape or saved['factor_3'].shape != init[2].shape:
+        return None
+
+    row = {w: i for i, w in enumerate(saved['words'])}
+    matched = [(j, row[w]) for j, w in enumerate(index_w) if w in row]
+    if matched:
+        new_rows, old_rows = zip(*matched)
+        init[0][list(new_rows)] = saved['factor_1'][list(old_rows)]
+    init[1] = saved['factor_2']
+    init[2] = saved['factor_3']
+    print("warm start: {} of {} index words".format(len(matched), len(index_w)))
+
+    return init
+
+
+def _components(corpora):
+    # Names of the components of the decomposition of the corpora, in the
+    # order of 'cp_als.fixed_mode_three()', e.g., ['ja', 'neu', 'ko'].
+
+    return [corpora[0], "neu"] + list(corpora[1:])
+
+
+def _save_seed_wordlist(index_w, result, seed, components=("ja", "neu", "ko")):
+    # Save the index words sorted by their mode-1 values of each component.
+
+    cpd_dir = "cpd_result"
+    country = list(components)
+
+    for i in range(len(country)):  # i denotes a component, e.g., 'ja', 'neu', 'ko'.
         result_file = "{}/{}_{}.txt".format(cpd_dir, country[i], str(seed))
-        with open(result_file, 'w') as f:
-            f.write(result_str)
-    return output
+        _save_ranking(result_file, index_w, result[i])
+
+
+def _save_ranking(result_file, words, scores):
+    # Save the words sorted by their scores (in descending order; ties keep the word order)
+    # as 'word<TAB>score' lines. The lines are joined and written at once.
 
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    with open(result_file, 'w') as f:
+        f.write("".join(["{}\t{}\n".format(words[j], scores[j]) for j in order]))
+    return order
+
+
+def _remove_seed_outputs(seed, corpora=('ja', 'ko')):
+    # Remove the per-seed outputs of 'CPD_wordlist()' (those that exist).
+
+    cpd_dir = "cpd_result"
+    files = ["{}/{}_{}.txt".format(cpd_dir, c, seed) for c in _components(corpora)]
+    files += ["{}/factors_{}.npz".format(cpd_dir, seed), "{}/log_{}.json".format(cpd_dir, seed)]
+    for path in files:
+        if os.path.exists(path):
+            os.remove(path)
 
 
 '''
 
-|++++++++++++++++++++++|
-| W2V_n_CPD_wordlist() |
-|++++++++++++++++++++++|
+|++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++|
+| CPD_wordlist_batch(seeds, verbose, w_jako, constrained, warm_start, ...) |
+|++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++|
+
+same as 'CPD_wordlist()' for many seeds, but the CP decompositions of all seeds
+are computed simultaneously using 'cp_als.parafac_batch()'.
+
+returns the vocabulary IDs of the index words and the transposed mode-1 factor of each seed (in seed order).
+'corpora' are as in 'CPD_wordlist()'.
+
+'''
+
+def CPD_wordlist_batch(seeds, verbose=True, w_jako=0.5, constrained=False, warm_start=False, embedding='w2v',
+                       corpora=('ja', 'ko')):
+    # Create 'cpd_result' directory if there isn't any.
+
+    cpd_dir = "cpd_result"
+    os.makedirs(cpd_dir, exist_ok=True)
+
+    index_words = common_func.load_index_words()
+
+    index_ids = []
+    index_ws = []
+    tensors = []
+    for seed in seeds:
+        kvs = [kv.load('word2vec/{}_{}_{}.kv'.format(embedding, c, str(seed))) for c in corpora]
+        ids, vectors = _aligned_vectors(kvs, index_words)
+        index_ids.append(ids)
+        index_ws.append([index_words[i] for i in ids])
+        tensors.append(np.stack(vectors, axis=2))
+    print("stacked X shape:", (len(tensors),) + tensors[0].shape)
+
+    country_values = cp_als.fixed_mode_three(len(corpora), w_jako)
+    rank = len(corpora) + 1
+
+    if warm_start:
+        init = [_warm_start_factors(seed, index_w, X.shape, embedding=embedding, corpora=corpora, w_jako=w_jako)
+                for seed, index_w, X in zip(seeds, index_ws, tensors)]
+    else:
+        init = None
+
+    decomposed = cp_als.parafac_batch(tensors, rank, random_state=2018, n_iter_max=300,
+                                      mode_three_val=country_values, verbose=verbose,
+                                      constrained=constrained, init=init)
+
+    outputs = []
+    for seed, ids, index_w, factors in zip(seeds, index_ids, index_ws, decomposed):
+        _save_factors(seed, index_w, factors, embedding=embedding, corpora=corpora, w_jako=w_jako)
+        result = factors[0].T
+        _save_seed_wordlist(index_w, result, seed, components=_components(corpora))
+        outputs.append((ids, result))
+    return outputs
+
+
+# Filtered lyrics data, and its counts (for the 'ppmi' embedding), shared by the seed
+# worker processes. These variables are only set by the _init_seed_worker() function below.
+
+_lyrics_xy = None
+_corpus = None
+
+
+def _init_seed_worker(lyrics_xy, corpus=None):
+    global _lyrics_xy, _corpus
+    _lyrics_xy = lyrics_xy
+    _corpus = corpus
+
+
+def _build_word2vec(seed, size=5, workers=1):
+    # Build j-pop and k-pop word2vec vectors.
+    # The word2vec models are reused if the filtered lyrics, seed, size and workers are unchanged.
+
+    cache.run_stage("word2vec_{}".format(seed), word2vec,
+                    inputs=common_func.corpus_files("filtered_lyrics/lyrics_ja") +
+                           common_func.corpus_files("filtered_lyrics/lyrics_ko"),
+                    outputs=_word2vec_files(seed),
+                    params={'seed': seed, 'size': size, 'workers': workers}, lyrics_xy=_lyrics_xy)
+
+
+def _word2vec_files(seed):
+    # Files of the j-pop and k-pop word2vec vectors of a seed (see 'word2vec()').
+
+    return vector_files("ja", seed) + vector_files("ko", seed)
+
+
+def vector_files(corpus, seed, embedding='w2v'):
+    # Files of the word vectors of a corpus & seed (the vectors may also be saved in the '.kv' file).
+
+    return ["word2vec/{}_{}_{}.kv{}".format(embedding, corpus, seed, ext) for ext in ("", ".vectors.npy")]
+
+
+def _build_ppmi(seed, size=5):
+    # Build j-pop and k-pop PPMI vectors.
+    # The vectors are reused if the filtered lyrics, seed and size are unchanged.
+
+    cache.run_stage("ppmi_{}".format(seed), ppmi_embedding,
+                    inputs=common_func.corpus_files("filtered_lyrics/lyrics_ja") +
+                           common_func.corpus_files("filtered_lyrics/lyrics_ko"),
+                    outputs=vector_files("ja", seed, 'ppmi') + vector_files("ko", seed, 'ppmi'),
+                    params={'seed': seed, 'size': size}, corpus=_corpus)
+
+
+def _build_embedding(seed, size=5, w2v_workers=1, embedding='w2v'):
+    if embedding == 'ppmi':
+        _build_ppmi(seed, size=size)
+    else:
+        _build_word2vec(seed, size=size, workers=w2v_workers)
+
+
+def _build_seed(seed, verbose=True, size=5, w_jako=0.5, engine='numpy', constrained=False,
+                warm_start=False, rank_stable=None, block_rows=None, w2v_workers=1, embedding='w2v',
+                corpora=('ja', 'ko'), rank_top=50):
+    _build_embedding(seed, size=size, w2v_workers=w2v_workers, embedding=embedding)
+
+    # Build CPD word list using fixed mode-3 value CP decomposition.
+
+    return CPD_wordlist(verbose=verbose, seed=seed, w_jako=w_jako, engine=engine, constrained=constrained,
+                        warm_start=warm_start, rank_stable=rank_stable, rank_top=rank_top, block_rows=block_rows,
+                        corpora=corpora, embedding=embedding)
+
+
+'''
+
+|+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++|
+| W2V_n_CPD_wordlist(n_seeds, seeds, n_jobs, size, w_jako, ...) |
+|+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++|
 
 repeatedly (1) build word2vectors using 'word2vec()' function and 
 repeatedly (2) build CPD word list using 'CPD_wordlist()' function which
 utilizes fixed mode-3 value CP decomposition.
 
+n_seeds seeds (0, 1, ..., n_seeds-1) are used unless the seeds are given explicitly.
+if embedding is 'ppmi', the word vectors are built by 'ppmi_embedding()' instead of 'word2vec()'.
+the PPMI vectors (and hence their CP decompositions) are the same for all seeds, so they are
+built & decomposed once, for the first seed only, and the word lists are those of that seed.
+'size' & 'w2v_workers' (as 'workers') are passed to 'word2vec()', and 'embedding', 'w_jako',
+'engine', 'constrained', 'warm_start', 'rank_stable', 'rank_top' & 'block_rows' to 'CPD_wordlist()'.
+the word vectors of a seed are only rebuilt if their inputs changed (see 'cache.py').
+
+the filtered lyrics data are loaded once. if n_jobs > 1, the seeds are
+distributed over a pool of n_jobs worker processes. the per-seed results
+are merged in seed order, so the output is identical to the serial run.
+
+if batched is True, the word2vec models of all seeds are built first, and then
+the CP decompositions of all seeds are computed at once by 'CPD_wordlist_batch()'
+('block_rows' is not used). the batched decomposition is that of the 'cp_als' engine,
+so a ValueError is raised if another engine or rank_stable is given.
+
+the per-seed mode-1 scores are accumulated into arrays indexed by the
+index word ID together with their running mean and variance, so memory
+does not grow with the number of seeds. the mean and variance of the
+scores are saved next to the summed word lists (except for 'ppmi', whose variance is 0):
+
+--- 'cpd_result/ja_stats.txt'
+--- 'cpd_result/ko_stats.txt'
+--- 'cpd_result/neu_stats.txt'
+
+the summed word lists ('cpd_result/ja.txt', 'ko.txt' & 'neu.txt') are also saved as
+binary ranked lists for 'common_func.load_word_list()' (see 'common_func.save_ranking()').
+
+'corpora' are the corpora decomposed together (see 'CPD_wordlist()'); the arrays, stats and
+word lists above have one entry per component of '_components(corpora)'. only the 'ja' & 'ko'
+word vectors are built here, so the vectors of any other corpus must already be saved
+as 'word2vec/{embedding}_{corpus}_{seed}.kv' for every seed.
+
+if w2v_workers > 1, the word lists of the first verify_seeds seeds are compared with
+those of single-threaded word2vec models using 'check_workers()', which records the
+rank correlations to 'cpd_result/workers_check.json'. if the check fails, the per-seed
+outputs and the word2vec models of all seeds are removed, and a RuntimeError is raised
+before the summed word lists are saved, so the build is not cached.
+
+'''
+
+
+
+def W2V_n_CPD_wordlist(n_seeds=10, seeds=None, n_jobs=1, size=5, w_jako=0.5, engine='numpy',
+                       constrained=False, batched=False, warm_start=False, rank_stable=None,
+                       block_rows=None, w2v_workers=1, verify_seeds=1, embedding='w2v', corpora=('ja', 'ko'),
+                       rank_top=50):
+    if batched and engine != 'cp_als':
+        raise ValueError("the batched decompositions use the 'cp_als' engine, not '{}'.".format(engine))
+    if batched and rank_stable:
+        raise ValueError("rank_stable is not available with the batched decompositions.")
+
+    if seeds is None:
+        seeds = range(n_seeds)
+    seeds = list(seeds)
+
+    # The PPMI vectors do not depend on the seed, so the other seeds would only repeat the first.
+
+    if embedding == 'ppmi':
+        seeds = seeds[:1]
+        n_jobs = 1
+
+    index_words = common_func.load_index_words()
+
+    # Summed scores, and running mean & sum of squared deviations (Welford's method)
+    # of the scores of each component (e.g., 'ja', 'neu', 'ko') of each index word.
+
+    country = _components(corpora)
+
+    score_sum = np.zeros((len(country), len(index_words)))
+    score_mean = np.zeros((len(country), len(index_words)))
+    score_m2 = np.zeros((len(country), len(index_words)))
+    n = 0
+
+    # Load filtered lyrics data once for all seeds.
+
+    lyrics_ja, lyrics_ko, label = common_func.load_xy()
+    lyrics_xy = (lyrics_ja, lyrics_ko)
+
+    corpus = cooccur.count_corpus(window=5) if embedding == 'ppmi' else None
+
+    # The pool is terminated even if a seed fails.
+
+    pool = None
+    try:
+        if batched:
+            if n_jobs == 1:
+                _init_seed_worker(lyrics_xy, corpus=corpus)
+                for seed in seeds:
+                    _build_embedding(seed, size=size, w2v_workers=w2v_workers, embedding=embedding)
+            else:
+                with Pool(processes=n_jobs, initializer=_init_seed_worker, initargs=(lyrics_xy,)) as pool:
+                    pool.map(partial(_build_embedding, size=size, w2v_workers=w2v_workers, embedding=embedding),
+                             seeds)
+
+            outputs = CPD_wordlist_batch(seeds, w_jako=w_jako, constrained=constrained, warm_start=warm_start,
+                                         embedding=embedding, corpora=corpora)
+        elif n_jobs == 1:
+            _init_seed_worker(lyrics_xy, corpus=corpus)
+            outputs = map(partial(_build_seed, size=size, w_jako=w_jako, engine=engine,
+                                  constrained=constrained, warm_start=warm_start, rank_stable=rank_stable,
+                                  rank_top=rank_top, block_rows=block_rows, w2v_workers=w2v_workers,
+                                  embedding=embedding, corpora=corpora), seeds)
+        else:
+            # Per-seed verbose output of parallel workers would be interleaved.
+
+            pool = Pool(processes=n_jobs, initializer=_init_seed_worker, initargs=(lyrics_xy,))
+            outputs = pool.imap(partial(_build_seed, verbose=False, size=size, w_jako=w_jako, engine=engine,
+                                        constrained=constrained, warm_start=warm_start, rank_stable=rank_stable,
+                                        rank_top=rank_top, block_rows=block_rows, w2v_workers=w2v_workers,
+                                        embedding=embedding, corpora=corpora),
+                                seeds)
+
+        # imap() yields the per-seed outputs in seed order. The outputs of the seeds
+        # checked by 'check_workers()' are kept.
+
+        verified = seeds[:verify_seeds] if embedding == 'w2v' and w2v_workers > 1 else []
+        built = {}
+        for seed, (index_ids, result) in zip(seeds, outputs):
+            if seed in verified:
+                built[seed] = (index_ids, result)
+
+            scores = np.zeros((len(country), len(index_words)))
+            scores[:, index_ids] = result
+
+            n += 1
+            score_sum += scores
+            delta = scores - score_mean
+            score_mean += delta / n
+            score_m2 += delta * (scores - score_mean)
+
+        if pool is not None and not batched:
+            pool.close()
+            pool.join()
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    # Check the word lists of the multi-threaded word2vec models against the single-threaded ones
+    # before saving the summed word lists. If they are not stable, the per-seed outputs and the
+    # cached word2vec models are removed, so unstable word lists are never used (nor cached).
+
+    if built and not check_workers(built, workers=w2v_workers, size=size, w_jako=w_jako, engine=engine,
+                                   constrained=constrained, lyrics_xy=lyrics_xy, corpora=corpora):
+        for seed in seeds:
+            cache.clear_stage("word2vec_{}".format(seed), _word2vec_files(seed))
+            _remove_seed_outputs(seed, corpora)
+        raise RuntimeError("the word lists of {} word2vec threads are not stable "
+                           "(see 'cpd_result/workers_check.json'); "
+                           "rebuild with w2v_workers=1.".format(w2v_workers))
+
+    score_var = score_m2 / max(n, 1)
+
+    # The PPMI word lists come from a single decomposition, so there are no statistics across seeds.
+
+    if embedding == 'w2v':
+        for i in range(len(country)):
+            order = np.argsort(-score_sum[i], kind='stable')
+            with open("cpd_result/{}_stats.txt".format(country[i]), 'w') as f:
+                for j in order:
+                    f.write("{}\t{}\t{}\n".format(index_words[j], score_mean[i][j], score_var[i][j]))
+
+    # The summed word lists are also saved in the binary format of 'common_func.save_ranking()'.
+
+    for i in range(len(country)):
+        order = _save_ranking("cpd_result/{}.txt".format(country[i]), index_words, score_sum[i].tolist())
+        common_func.save_ranking("cpd_result/{}".format(country[i]), order, score_sum[i][order])
+
+'''
+
+|+++++++++++++++++++++++++++++++++++++++++++++++|
+| check_constrained(seeds, engine, n_iter, ...) |
+|+++++++++++++++++++++++++++++++++++++++++++++++|
+
+checks that the constrained CP decomposition (which skips the update of the fixed
+mode-3 factor) yields the same index word rankings as the original decomposition.
+
+both decompositions are run as in 'CPD_wordlist()' (at most n_iter iterations with the
+default tolerance) on the saved word2vec models of the seeds, and stop at the same
+iteration since the constrained reconstruction error also uses the least-squares
+mode-3 factor (see 'cp_als.parafac()').
+
+the word vectors of the 'corpora' are decomposed together as in 'CPD_wordlist()'.
+
+returns True if the rankings of all the components (e.g., 'ja', 'neu', 'ko') of all seeds are the same.
+
+'''
+
+def check_constrained(seeds=range(10), engine='numpy', n_iter=300, w_jako=0.5, corpora=('ja', 'ko'),
+                      embedding='w2v'):
+    parafac = _parafac(engine)
+
+    country_values = cp_als.fixed_mode_three(len(corpora), w_jako)
+    rank = len(corpora) + 1
+    index_words = common_func.load_index_words()
+
+    same = True
+    for seed in seeds:
+        kvs = [kv.load('word2vec/{}_{}_{}.kv'.format(embedding, c, str(seed))) for c in corpora]
+        ids, vectors = _aligned_vectors(kvs, index_words)
+        X = np.stack(vectors, axis=2)
+
+        original = parafac(X, rank, random_state=2018, n_iter_max=n_iter, mode_three_val=country_values)
+        constrained = parafac(X, rank, random_state=2018, n_iter_max=n_iter, mode_three_val=country_values,
+                              constrained=True)
+
+        rank_original = np.argsort(-original[0], axis=0, kind='stable')
+        rank_constrained = np.argsort(-constrained[0], axis=0, kind='stable')
+        same_seed = np.array_equal(rank_original, rank_constrained)
+        print("seed {}: same rankings = {}".format(seed, same_seed))
+        same = same and same_seed
+
+    return same
+
+
 '''
 
+|++++++++++++++++++++++++++++++++++++++++++++++++++|
+| check_workers(built, workers, size, w_jako, ...) |
+|++++++++++++++++++++++++++++++++++++++++++++++++++|
 
+checks the stability of the word lists when the word2vec models are trained with
+multiple threads, which makes the training non-deterministic.
+
+'built' maps each checked seed to the output of its build with 'workers' threads,
+i.e., the vocabulary IDs of the index words and the transposed mode-1 factor
+returned by 'CPD_wordlist()'. for each seed, reference word2vec models are trained with
+one thread (without being saved), and decomposed in the same way ('w_jako', 'engine',
+'constrained' & 'corpora'; the vectors of corpora other than 'ja' & 'ko' are loaded
+from 'word2vec'). the word lists of the built and the reference decompositions are
+compared by the Spearman rank correlation of the mode-1 scores of each component.
+
+the rank correlations are saved to 'cpd_result/workers_check.json'; the check passes
+if all of them are at least min_spearman.
+
+returns True if the check passed.
+
+'''
+
+def check_workers(built, workers=4, size=5, w_jako=0.5, engine='numpy', constrained=False, min_spearman=0.99,
+                  lyrics_xy=None, corpora=('ja', 'ko')):
+    parafac = _parafac(engine)
+    country_values = cp_als.fixed_mode_three(len(corpora), w_jako)
+    country = _components(corpora)
+
+    if lyrics_xy is None:
+        lyrics_ja, lyrics_ko, label = common_func.load_xy()
+        lyrics_xy = (lyrics_ja, lyrics_ko)
+
+    index_words = common_func.load_index_words()
+
+    # Create 'cpd_result' directory if there isn't any.
+
+    cpd_dir = "cpd_result"
+    os.makedirs(cpd_dir, exist_ok=True)
+
+    report = {'workers': workers, 'size': size, 'engine': engine, 'min_spearman': min_spearman, 'seeds': {}}
+    for seed, (built_ids, built_result) in built.items():
+        model_ja, model_ko = _train_word2vec(seed, lyrics_xy=lyrics_xy, size=size, workers=1)
+        trained = {'ja': model_ja.wv, 'ko': model_ko.wv}
+        kvs = [trained[c] if c in trained else kv.load('word2vec/w2v_{}_{}.kv'.format(c, str(seed)))
+               for c in corpora]
+        ids, vectors = _aligned_vectors(kvs, index_words)
+        factors = parafac(np.stack(vectors, axis=2), len(corpora) + 1, random_state=2018, n_iter_max=300,
+                          mode_three_val=country_values, constrained=constrained)
+
+        # Compare the scores of the index words of both decompositions.
+
+        built_scores = np.full((len(country), len(index_words)), np.nan)
+        built_scores[:, built_ids] = built_result
+        scores = np.full((len(country), len(index_words)), np.nan)
+        scores[:, ids] = np.asarray(factors[0]).T
+        common = ~(np.isnan(built_scores[0]) | np.isnan(scores[0]))
+
+        rho = {country[i]: float(spearmanr(scores[i][common], built_scores[i][common])[0])
+               for i in range(len(country))}
+        print("seed {}: Spearman rank correlations = {}".format(seed, rho))
+        report['seeds'][str(seed)] = rho
+
+    rhos = [r for seed_rho in report['seeds'].values() for r in seed_rho.values()]
+    report['min'] = min(rhos) if rhos else None
+    report['stable'] = all(r >= min_spearman for r in rhos)
+    if not report['stable']:
+        print("WARNING: the word lists of {} word2vec threads are not stable (min. Spearman {} < {}).".format(
+            workers, report['min'], min_spearman))
+
+    with open("{}/workers_check.json".format(cpd_dir), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    return report['stable']
 
-def W2V_n_CPD_wordlist():
-    jako_dict = pickle.load(open("dictionary/ja2ko_dict.p", 'rb'))
-    dict_keys = list(jako_dict.values())
-    dict_ja = Counter(dict.fromkeys(dict_keys, 0))
-    dict_ko = Counter(dict.fromkeys(dict_keys, 0))
-    dict_neu = Counter(dict.fromkeys(dict_keys, 0))
-
-    for i in range(10):
-        # Build j-pop and k-pop word2vec vectors.
-
-        word2vec(seed=i)
-
-        # Build CPD word list using fixed mode-3 value CP decomposition.
-
-        output = CPD_wordlist(verbose=True, seed=i)
-
-        dict_ja.update(Counter(output[0]))
-        dict_neu.update(Counter(output[1]))
-        dict_ko.update(Counter(output[2]))
-
-    dict_ja = dict(dict_ja)
-    dict_ko = dict(dict_ko)
-    dict_neu = dict(dict_neu)
-
-    sorted_list_ja = [(k, dict_ja[k]) for k in sorted(dict_ja, key=dict_ja.get, reverse=True)]
-    result_str_ja = ""
-    word_list_ja = []
-    for k, v in sorted_list_ja:
-        result_str_ja += "{}\t{}\n".format(k, v)
-        word_list_ja.append(k)
-    # print(result_str_ja)
-    result_file_ja = "cpd_result/ja.txt"
-    with open(result_file_ja, 'w') as f:
-        f.write(result_str_ja)
-
-    sorted_list_ko = [(k, dict_ko[k]) for k in sorted(dict_ko, key=dict_ko.get, reverse=True)]
-    result_str_ko = ""
-    word_list_ko = []
-    for k, v in sorted_list_ko:
-        result_str_ko += "{}\t{}\n".format(k, v)
-        word_list_ko.append(k)
-    # print(result_str_ko)
-    result_file_ko = "cpd_result/ko.txt"
-    with open(result_file_ko, 'w') as f:
-        f.write(result_str_ko)
-
-    sorted_list_neu = [(k, dict_neu[k]) for k in sorted(dict_neu, key=dict_neu.get, reverse=True)]
-    result_str_neu = ""
-    word_list_neu = []
-    for k, v in sorted_list_neu:
-        result_str_neu += "{}\t{}\n".format(k, v)
-        word_list_neu.append(k)
-    # print(result_str_neu)
-    result_file_neu = "cpd_result/neu.txt"
-    with open(result_file_neu, 'w') as f:
-        f.write(result_str_neu)
 
 #---------------------------------------
 # Builds j-pop and k-pop word2vec vectors and
@@ -251,9 +899,12 @@ def W2V_n_CPD_wordlist():
 
 #W2V_n_CPD_wordlist()
 
+#---------------------------------------
+# Checks that the constrained CP decomposition yields the same word rankings.
 
+#check_constrained()
 
+#---------------------------------------
+# Checks the stability of the word lists of multi-threaded word2vec models.
 
-
-
-
+#check_workers()
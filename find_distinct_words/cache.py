@@ -0,0 +1,141 @@
+import os
+import json
+import hashlib
+
+'''
+
+# Author: Heeryon Cho <heeryon.cho@gmail.com>
+# License: BSD-3-clause
+
+This code provides a content-addressed cache for the pipeline stages.
+
+Each stage is keyed by a hash of the content of its input files and of its
+parameters. The key and the hashes of the stage's output files are recorded
+under the 'cache' directory:
+
+--- 'cache/{stage}.json'
+
+A stage is skipped when its key is unchanged and its output files still
+exist with the recorded content. Since the outputs of a stage are the inputs
+of the next stage, a change anywhere reruns all the stages that depend on it.
+
+--- file_hash(path) : hashes the content of a file.
+--- stage_key(inputs, params) : hashes the input files and parameters of a stage.
+--- run_stage(stage, func, inputs, outputs, params, **kwargs) : runs a stage unless it is cached.
+--- clear_stage(stage, outputs) : removes the cache record and the output files of a stage.
+
+'''
+
+cache_dir = "cache"
+
+
+'''
+
+|+++++++++++++++++|
+| file_hash(path) |
+|+++++++++++++++++|
+
+returns the SHA-1 hash of the content of the file.
+
+'''
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+'''
+
+|+++++++++++++++++++++++++++|
+| stage_key(inputs, params) |
+|+++++++++++++++++++++++++++|
+
+returns the cache key of a stage, i.e., the SHA-1 hash of
+the content of its input files and of its parameters.
+
+'''
+
+def stage_key(inputs, params):
+    h = hashlib.sha1()
+    for path in inputs:
+        h.update(path.encode('utf-8'))
+        h.update(file_hash(path).encode('utf-8'))
+    h.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _is_fresh(record, key, outputs):
+    if record is None or record['key'] != key:
+        return False
+    for path in outputs:
+        if not os.path.exists(path) or record['outputs'].get(path) != file_hash(path):
+            return False
+    return True
+
+
+'''
+
+|+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++|
+| run_stage(stage, func, inputs, outputs, params, **kwargs) |
+|+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++|
+
+runs func(**params, **kwargs) unless the stage is cached.
+
+--- stage : /str/ name of the stage; also the name of the cache record.
+--- inputs : list of the input files of the stage.
+--- outputs : list of the output files of the stage.
+--- params : /dict/ parameters of the stage; these are part of the cache key.
+--- kwargs : extra arguments of func that are not part of the cache key
+             (e.g., data that was already loaded from the input files).
+
+returns True if the stage was run, and False if it was skipped.
+
+'''
+
+def run_stage(stage, func, inputs=(), outputs=(), params=None, **kwargs):
+    # Create 'cache' directory if there isn't any; the stages of the seed worker
+    # processes may create it at the same time.
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    params = {} if params is None else params
+    key = stage_key(inputs, params)
+
+    record_file = "{}/{}.json".format(cache_dir, stage)
+    record = None
+    if os.path.exists(record_file):
+        with open(record_file, 'r') as f:
+            record = json.load(f)
+
+    if _is_fresh(record, key, outputs):
+        print("[cache] '{}' is up to date; skipped.".format(stage))
+        return False
+
+    kwargs.update(params)
+    func(**kwargs)
+
+    record = {'key': key, 'outputs': {path: file_hash(path) for path in outputs}}
+    with open(record_file, 'w') as f:
+        json.dump(record, f, indent=2, sort_keys=True)
+
+    return True
+
+
+'''
+
+|+++++++++++++++++++++++++++++|
+| clear_stage(stage, outputs) |
+|+++++++++++++++++++++++++++++|
+
+removes the cache record of a stage and its output files (those that exist),
+so that the stage is run again, e.g., when its outputs turned out to be unusable.
+
+'''
+
+def clear_stage(stage, outputs=()):
+    for path in ["{}/{}.json".format(cache_dir, stage)] + list(outputs):
+        if os.path.exists(path):
+            os.remove(path)
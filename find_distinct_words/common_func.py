@@ -1,5 +1,6 @@
 import os
 import pickle
+import hashlib
 import numpy as np
 import pandas as pd
 
@@ -10,7 +11,16 @@ import pandas as pd
 
 This code includes some common functions that are repeatedly used:
 
+--- save_corpus(prefix, lyrics, vocab) : saves lyrics data in a columnar format (vocabulary, token IDs, offsets).
+--- load_corpus(prefix) : loads columnar lyrics data as memory-mapped arrays.
+--- load_lyrics(prefix) : loads columnar or pickled lyrics data as word lists.
 --- load_xy() : loads filtered lyrics data.
+--- encode_xy() : encodes filtered lyrics data into integer token IDs (CSR-style).
+--- iter_tokenized(lang) : iterates over the tokenized (unfiltered) lyrics data.
+--- save_index_words(words) : saves the index words of the alignment dictionary; a word's line number is its ID.
+--- load_index_words() : loads the index words of the alignment dictionary; a word's position is its ID.
+--- save_ranking(prefix, ids, scores) : saves a ranked list of index words in a binary format.
+--- load_ranking(prefix) : loads a binary ranked list as memory-mapped arrays.
 --- load_word_list(weight) : loads CP decomposition J-pop, K-pop, & Neutral 
                              word lists which are saved under the 'cpd_result' directory.
 --- get_avg(mean_list) : calculates the mean average clustering performance.
@@ -19,6 +29,130 @@ This code includes some common functions that are repeatedly used:
 '''
 
 
+'''
+
+|++++++++++++++++++++++++++++++++++++|
+| save_corpus(prefix, lyrics, vocab) |
+|++++++++++++++++++++++++++++++++++++|
+
+saves tokenized lyrics data (one word list per lyric) in a compact columnar format:
+
+--- '{prefix}.vocab' : the vocabulary, one word per line; a word's line number is its ID.
+--- '{prefix}.ids' : the token IDs of all lyrics (raw int32 array).
+--- '{prefix}.offsets' : the offsets of the lyrics (raw int64 array); the tokens of
+                         the i-th lyric are ids[offsets[i]:offsets[i+1]].
+
+the lyrics can be any iterable (e.g., a generator); they are appended to
+file one by one. if the vocabulary is not given, the words are numbered
+in order of first appearance.
+
+returns the number of saved lyrics.
+
+'''
+
+def save_corpus(prefix, lyrics, vocab=None):
+    if vocab is None:
+        vocab = []
+        word_id = {}
+    else:
+        vocab = list(vocab)
+        word_id = {w: i for i, w in enumerate(vocab)}
+
+    n_lyrics = 0
+    offset = 0
+    with open(prefix + ".ids", 'wb') as f_ids, open(prefix + ".offsets", 'wb') as f_offsets:
+        f_offsets.write(np.int64(0).tobytes())
+        for lyric in lyrics:
+            ids = np.empty(len(lyric), dtype=np.int32)
+            for i, w in enumerate(lyric):
+                if w not in word_id:
+                    word_id[w] = len(vocab)
+                    vocab.append(w)
+                ids[i] = word_id[w]
+            f_ids.write(ids.tobytes())
+            offset += len(ids)
+            f_offsets.write(np.int64(offset).tobytes())
+            n_lyrics += 1
+
+    with open(prefix + ".vocab", 'w') as f:
+        for w in vocab:
+            f.write(w + "\n")
+
+    return n_lyrics
+
+
+def corpus_files(prefix):
+    return [prefix + ".vocab", prefix + ".ids", prefix + ".offsets"]
+
+
+def _memmap(path, dtype):
+    # np.memmap() cannot map an empty file.
+
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+'''
+
+|+++++++++++++++++++++|
+| load_corpus(prefix) |
+|+++++++++++++++++++++|
+
+loads lyrics data saved by 'save_corpus()'.
+
+returns the vocabulary (object array), and the token IDs & offsets as
+read-only memory-mapped arrays, i.e., without reading them into memory.
+
+'''
+
+def load_corpus(prefix):
+    with open(prefix + ".vocab", 'r') as f:
+        vocab = np.array([line.rstrip("\n") for line in f], dtype=object)
+    ids = _memmap(prefix + ".ids", np.int32)
+    offsets = _memmap(prefix + ".offsets", np.int64)
+    return vocab, ids, offsets
+
+
+'''
+
+|+++++++++++++++++++++|
+| load_lyrics(prefix) |
+|+++++++++++++++++++++|
+
+loads lyrics data as a list of word lists.
+
+the lyrics are read from the columnar files of 'save_corpus()' if they exist,
+and from the '{prefix}.p' pickle file otherwise.
+
+'''
+
+def load_lyrics(prefix):
+    if not all(os.path.exists(path) for path in corpus_files(prefix)):
+        with open(prefix + ".p", 'rb') as f:
+            return pickle.load(f)
+
+    vocab, ids, offsets = load_corpus(prefix)
+    words = vocab[ids].tolist()
+    return [words[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def _encode_lyrics(prefix):
+    # Same as 'load_corpus()', but the pickled lyrics are encoded in memory
+    # if the columnar files do not exist.
+
+    if all(os.path.exists(path) for path in corpus_files(prefix)):
+        return load_corpus(prefix)
+
+    lyrics = load_lyrics(prefix)
+    vocab = sorted(set(w for lyric in lyrics for w in lyric))
+    word_id = {w: i for i, w in enumerate(vocab)}
+    ids = np.fromiter((word_id[w] for lyric in lyrics for w in lyric), dtype=np.int32)
+    offsets = np.zeros(len(lyrics) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(lyric) for lyric in lyrics])
+    return np.array(vocab, dtype=object), ids, offsets
+
+
 '''
 
 |+++++++++++|
@@ -30,12 +164,10 @@ load filtered J-pop & K-pop lyrics data.
 '''
 
 def load_xy():
-    with open("filtered_lyrics/lyrics_ja.p", 'rb') as f:
-        lyrics_ja = pickle.load(f)
+    lyrics_ja = load_lyrics("filtered_lyrics/lyrics_ja")
     print("lyrics ja:", len(lyrics_ja))
 
-    with open("filtered_lyrics/lyrics_ko.p", 'rb') as f:
-        lyrics_ko = pickle.load(f)
+    lyrics_ko = load_lyrics("filtered_lyrics/lyrics_ko")
     print("lyrics ko:", len(lyrics_ko))
 
     label_ja = [1] * len(lyrics_ja)
@@ -45,6 +177,176 @@ def load_xy():
     return lyrics_ja, lyrics_ko, label
 
 
+'''
+
+|+++++++++++++|
+| encode_xy() |
+|+++++++++++++|
+
+encodes filtered J-pop & K-pop lyrics data into integer token IDs.
+
+the lyrics are stored in a CSR-style layout: a flat 'tokens' array holding
+the token IDs of all lyrics, and an 'offsets' array where the tokens of the
+i-th lyric are tokens[offsets[i]:offsets[i+1]].
+
+the vocabulary is sorted, so token ID order equals the alphabetical order of words.
+it only contains the words that occur in the lyrics.
+
+'''
+
+def encode_xy():
+    vocab_ja, ids_ja, offsets_ja = _encode_lyrics("filtered_lyrics/lyrics_ja")
+    print("lyrics ja:", len(offsets_ja) - 1)
+
+    vocab_ko, ids_ko, offsets_ko = _encode_lyrics("filtered_lyrics/lyrics_ko")
+    print("lyrics ko:", len(offsets_ko) - 1)
+
+    # Map the token IDs of both lyrics data to the sorted union of their vocabularies.
+
+    vocab = np.unique(np.concatenate([vocab_ja, vocab_ko]))
+    tokens = np.concatenate([np.searchsorted(vocab, vocab_ja)[ids_ja],
+                             np.searchsorted(vocab, vocab_ko)[ids_ko]])
+
+    # Drop the words that do not occur in the lyrics.
+
+    used = np.bincount(tokens, minlength=len(vocab)) > 0
+    new_id = np.cumsum(used) - 1
+    tokens = new_id[tokens].astype(np.int32)
+
+    offsets = np.concatenate([offsets_ja, offsets_ja[-1] + offsets_ko[1:]]).astype(np.int64)
+    label = np.array([1] * (len(offsets_ja) - 1) + [0] * (len(offsets_ko) - 1))
+
+    return vocab[used], tokens, offsets, label
+
+
+'''
+
+|++++++++++++++++++++++|
+| iter_tokenized(lang) |
+|++++++++++++++++++++++|
+
+iterates over the tokenized J-pop ('ja') or K-pop ('ko') lyrics data, one word list per lyric.
+
+the lyrics are read from the columnar files 'processed/word_list_{lang}.{vocab,ids,offsets}'
+(see 'save_corpus()') if they exist, and from 'processed/word_list_{lang}.p' otherwise.
+
+'''
+
+def iter_tokenized(lang):
+    prefix = "processed/word_list_{}".format(lang)
+    if all(os.path.exists(path) for path in corpus_files(prefix)):
+        vocab, ids, offsets = load_corpus(prefix)
+        for i in range(len(offsets) - 1):
+            yield vocab[ids[offsets[i]:offsets[i + 1]]].tolist()
+    else:
+        with open(prefix + ".p", 'rb') as f:
+            for words in pickle.load(f):
+                yield words
+
+
+'''
+
+|+++++++++++++++++++++++++|
+| save_index_words(words) |
+|+++++++++++++++++++++++++|
+
+saves the (Korean) index words of the J-pop/K-pop lyrics word alignment dictionary
+to 'dictionary/index_words.txt', one word per line; a word's line number is its vocabulary ID.
+
+'''
+
+def save_index_words(words):
+    with open("dictionary/index_words.txt", 'w') as f:
+        for w in words:
+            f.write(w + "\n")
+
+
+def index_words_file():
+    # The index words are read from 'dictionary/index_words.txt', or from the
+    # alignment dictionary if it was built before the index words were saved.
+
+    if os.path.exists("dictionary/index_words.txt"):
+        return "dictionary/index_words.txt"
+    return "dictionary/ja2ko_dict.p"
+
+
+'''
+
+|++++++++++++++++++++|
+| load_index_words() |
+|++++++++++++++++++++|
+
+loads the (Korean) index words of the J-pop/K-pop lyrics word alignment dictionary
+(see 'save_index_words()').
+the position of an index word in the returned list is used as its vocabulary ID.
+
+'''
+
+def load_index_words():
+    if index_words_file() == "dictionary/index_words.txt":
+        with open("dictionary/index_words.txt", 'r') as f:
+            return [line.rstrip("\n") for line in f]
+
+    with open("dictionary/ja2ko_dict.p", 'rb') as f:
+        jako_dict = pickle.load(f)
+    return list(jako_dict.values())
+
+
+'''
+
+|+++++++++++++++++++++++++++++++++++|
+| save_ranking(prefix, ids, scores) |
+|+++++++++++++++++++++++++++++++++++|
+
+saves a ranked list of index words (e.g., the summed CPD word list of 'cpd_result/ja.txt')
+in a compact binary format, next to the text file:
+
+--- '{prefix}.rank_ids' : the IDs of the ranked index words (see 'load_index_words()'),
+                          from the top to the bottom of the list (raw int32 array).
+--- '{prefix}.rank_scores' : the scores of the ranked index words (raw float64 array).
+--- '{prefix}.rank_index' : the SHA-1 hash of the index words file that the IDs refer to.
+
+'''
+
+def save_ranking(prefix, ids, scores):
+    np.asarray(ids, dtype=np.int32).tofile(prefix + ".rank_ids")
+    np.asarray(scores, dtype=np.float64).tofile(prefix + ".rank_scores")
+    with open(prefix + ".rank_index", 'w') as f:
+        f.write(_index_words_hash() + "\n")
+
+
+def ranking_files(prefix):
+    return [prefix + ".rank_ids", prefix + ".rank_scores", prefix + ".rank_index"]
+
+
+def _index_words_hash():
+    # The IDs of a binary ranked list are only valid for the index words they were saved with.
+
+    h = hashlib.sha1()
+    with open(index_words_file(), 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+'''
+
+|++++++++++++++++++++++|
+| load_ranking(prefix) |
+|++++++++++++++++++++++|
+
+loads a ranked list saved by 'save_ranking()'.
+
+returns the IDs & scores of the ranked index words as read-only memory-mapped arrays.
+
+'''
+
+def load_ranking(prefix):
+    ids = _memmap(prefix + ".rank_ids", np.int32)
+    scores = _memmap(prefix + ".rank_scores", np.float64)
+    return ids, scores
+
+
 '''
 
 |++++++++++++++++++++++++|
@@ -53,19 +355,59 @@ def load_xy():
 
 loads CP decomposition (CPD) applied word lists. (J-pop, K-pop, Neutral)
 
+a word list is read from its binary ranked list (see 'save_ranking()') unless
+the text file is newer or the index words have changed since the list was saved
+(e.g., rewritten by 'check_dictionary()'), and from the text file otherwise.
+
+the word lists are loaded once and reused by the later calls as long as their
+files are unchanged. each call returns new lists, so they can be modified.
+
 '''
 
 def load_word_list():
-    df_ja = pd.read_csv("cpd_result/ja.txt", header=None, delimiter='\t')
-    word_list_ja = list(df_ja[0].values)
+    word_list_ja = _load_ranked_words("cpd_result/ja")
+    word_list_ko = _load_ranked_words("cpd_result/ko")
+    word_list_neu = _load_ranked_words("cpd_result/neu")
+
+    return word_list_ja, word_list_ko, word_list_neu
 
-    df_ko = pd.read_csv("cpd_result/ko.txt", header=None, delimiter='\t')
-    word_list_ko = list(df_ko[0].values)
 
-    df_neu = pd.read_csv("cpd_result/neu.txt", header=None, delimiter='\t')
-    word_list_neu = list(df_neu[0].values)
+# Loaded word lists, i.e., {prefix: (modification times & sizes of the files, words)}.
 
-    return word_list_ja, word_list_ko, word_list_neu
+_ranked_words = {}
+
+
+def _load_ranked_words(prefix):
+    text_file = prefix + ".txt"
+    binary = all(os.path.exists(path) for path in ranking_files(prefix))
+    if binary and os.path.exists(text_file):
+        binary = os.path.getmtime(text_file) <= min(os.path.getmtime(path) for path in ranking_files(prefix))
+
+    # The binary lists refer to the vocabulary IDs of the index words, so the text file
+    # is read instead when the index words differ from those the IDs were saved with.
+
+    paths = ranking_files(prefix) + [index_words_file()] if binary else [text_file]
+    if binary and os.path.exists(text_file):
+        paths.append(text_file)
+    stamp = [(os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths]
+
+    if prefix not in _ranked_words or _ranked_words[prefix][0] != stamp:
+        if binary:
+            with open(prefix + ".rank_index", 'r') as f:
+                binary = f.read().strip() == _index_words_hash()
+            if not binary and not os.path.exists(text_file):
+                raise RuntimeError("'{}' refers to other index words than '{}' and '{}' is missing."
+                                   .format(prefix + ".rank_ids", index_words_file(), text_file))
+        if binary:
+            ids, scores = load_ranking(prefix)
+            index_words = np.array(load_index_words(), dtype=object)
+            words = index_words[ids].tolist()
+        else:
+            df = pd.read_csv(text_file, header=None, delimiter='\t')
+            words = list(df[0].values)
+        _ranked_words[prefix] = (stamp, words)
+
+    return list(_ranked_words[prefix][1])
 
 '''
 
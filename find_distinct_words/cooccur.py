@@ -0,0 +1,246 @@
+import numpy as np
+from scipy import sparse
+from find_distinct_words import common_func
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+'''
+
+# Author: Heeryon Cho <heeryon.cho@gmail.com>
+# License: BSD-3-clause
+
+This code counts the words of the filtered lyrics data over their vocabulary IDs:
+
+--- the document-term counts (one row per lyric), and
+--- the windowed co-occurrence counts of the J-pop & K-pop lyrics.
+
+The counts are built from the encoded lyrics (see 'common_func.encode_xy()') in one pass,
+and can be put into shared memory, so that the worker processes of a process pool
+read them without receiving a pickled copy each.
+
+--- doc_term_counts(tokens, offsets, n_words) : builds the document-term count matrix.
+--- cooccurrence(tokens, offsets, n_words, window, groups) : counts the co-occurring words.
+--- count_corpus(window) : counts the filtered lyrics data.
+--- share(data) : puts arrays & sparse matrices into shared memory.
+--- attach(handle) : reads arrays & sparse matrices from shared memory.
+--- release(blocks) : frees the shared memory.
+
+'''
+
+
+'''
+
+|+++++++++++++++++++++++++++++++++++++++++++|
+| doc_term_counts(tokens, offsets, n_words) |
+|+++++++++++++++++++++++++++++++++++++++++++|
+
+builds the document-term count matrix of the CSR-style lyrics data.
+
+columns follow the vocabulary order, i.e., the sorted order of 'common_func.encode_xy()',
+which is the same column order TfidfVectorizer uses. the words of each row are stored as
+CountVectorizer stores them, i.e., in the order of their first occurrence in the whole
+lyrics data (which is also their order in any subset of the words), so that sums over
+the rows (e.g., the l2 norms of the tf-idf vectors, and the k-means distances) are computed
+in the same order and give bit-identical results.
+
+'''
+
+def doc_term_counts(tokens, offsets, n_words):
+    tokens = np.asarray(tokens, dtype=np.int64)
+    offsets = np.asarray(offsets)
+    n_docs = len(offsets) - 1
+
+    # Words in the order of their first occurrence (the words that never occur come last),
+    # and the rank of each word in that order.
+
+    seen, first = np.unique(tokens, return_index=True)
+    by_occurrence = np.concatenate([seen[np.argsort(first)], np.setdiff1d(np.arange(n_words), seen)])
+    rank = np.empty(n_words, dtype=np.int64)
+    rank[by_occurrence] = np.arange(n_words)
+
+    # Count the (lyric, word rank) pairs; they are sorted by lyric, then by word rank.
+
+    doc = np.repeat(np.arange(n_docs), np.diff(offsets))
+    pairs, counts = np.unique(doc * n_words + rank[tokens], return_counts=True)
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(pairs // n_words, minlength=n_docs))])
+
+    return sparse.csr_matrix((counts, by_occurrence[pairs % n_words], indptr), shape=(n_docs, n_words))
+
+
+'''
+
+|++++++++++++++++++++++++++++++++++++++++++++++++++++++++|
+| cooccurrence(tokens, offsets, n_words, window, groups) |
+|++++++++++++++++++++++++++++++++++++++++++++++++++++++++|
+
+counts the pairs of words that occur within 'window' words of each other in a
+lyric of the CSR-style lyrics data.
+
+returns a symmetric (n_words x n_words) sparse matrix of the counts, or, if the
+group (e.g., the label) of each lyric is given, the list of the count matrices
+of each group 0, 1, ..., max(groups).
+
+'''
+
+def cooccurrence(tokens, offsets, n_words, window=5, groups=None):
+    tokens = np.asarray(tokens)
+    offsets = np.asarray(offsets)
+
+    # Lyric of each token.
+
+    doc = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+    rows = [np.zeros(0, dtype=tokens.dtype)]
+    cols = [np.zeros(0, dtype=tokens.dtype)]
+    docs = [np.zeros(0, dtype=doc.dtype)]
+    for d in range(1, window + 1):
+        same = doc[:-d] == doc[d:]
+        rows.append(tokens[:-d][same])
+        cols.append(tokens[d:][same])
+        docs.append(doc[:-d][same])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    docs = np.concatenate(docs)
+
+    def count(selected):
+        counts = sparse.coo_matrix((np.ones(int(selected.sum())), (rows[selected], cols[selected])),
+                                   shape=(n_words, n_words)).tocsr()
+        return counts + counts.T
+
+    if groups is None:
+        return count(np.ones(len(rows), dtype=bool))
+
+    groups = np.asarray(groups)
+    pair_group = groups[docs]
+    return [count(pair_group == g) for g in range(int(groups.max()) + 1)]
+
+
+'''
+
+|++++++++++++++++++++++|
+| count_corpus(window) |
+|++++++++++++++++++++++|
+
+encodes the filtered lyrics data and counts its words.
+
+returns a dict of:
+
+--- 'vocab' : the vocabulary (object array).
+--- 'tokens', 'offsets', 'label' : the encoded lyrics (see 'common_func.encode_xy()').
+--- 'counts' : the document-term count matrix (see 'doc_term_counts()').
+--- 'cooccur_ja', 'cooccur_ko' : the co-occurrence count matrices of the J-pop & K-pop lyrics
+                                 (see 'cooccurrence()'); only if window is not None.
+
+'''
+
+def count_corpus(window=None):
+    vocab, tokens, offsets, label = common_func.encode_xy()
+
+    corpus = {'vocab': vocab, 'tokens': tokens, 'offsets': offsets, 'label': label,
+              'counts': doc_term_counts(tokens, offsets, len(vocab))}
+
+    if window is not None:
+        # The label is 1 for the J-pop lyrics and 0 for the K-pop lyrics.
+
+        corpus['cooccur_ko'], corpus['cooccur_ja'] = cooccurrence(tokens, offsets, len(vocab),
+                                                                  window=window, groups=label)
+
+    return corpus
+
+
+'''
+
+|+++++++++++++|
+| share(data) |
+|+++++++++++++|
+
+copies the numeric arrays & sparse matrices of a dict into shared memory blocks.
+
+returns a handle, i.e., a small picklable description of the blocks to pass to the
+worker processes (see 'attach()'), and the list of the blocks to free when they are
+no longer needed (see 'release()').
+
+arrays of objects (e.g., the vocabulary) are kept in the handle, i.e., copied. without
+'multiprocessing.shared_memory' (Python < 3.8), all the arrays are kept in the handle.
+
+'''
+
+def share(data):
+    handle = {}
+    blocks = []
+
+    def put(array):
+        array = np.ascontiguousarray(array)
+        if shared_memory is None or array.dtype == object or array.nbytes == 0:
+            return array
+        block = shared_memory.SharedMemory(create=True, size=array.nbytes)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        return (block.name, array.shape, array.dtype.str)
+
+    for name, value in data.items():
+        if sparse.issparse(value):
+            value = sparse.csr_matrix(value)
+            handle[name] = ('csr', value.shape, [put(value.data), put(value.indices), put(value.indptr)])
+        else:
+            handle[name] = ('array', put(value))
+
+    return handle, blocks
+
+
+# Shared memory blocks attached by this process. They are kept open as long as the
+# process runs, since the arrays returned by attach() use their memory.
+
+_attached = []
+
+
+'''
+
+|++++++++++++++++|
+| attach(handle) |
+|++++++++++++++++|
+
+returns the dict of arrays & sparse matrices described by a handle of 'share()'.
+the arrays use the shared memory blocks without copying them; they must not be modified.
+
+the blocks are freed by the process that created them ('release()'), so the handle
+should only be attached by its worker processes (which use the same resource tracker).
+
+'''
+
+def attach(handle):
+    def get(spec):
+        if isinstance(spec, np.ndarray):
+            return spec
+        name, shape, dtype = spec
+        block = shared_memory.SharedMemory(name=name)
+        _attached.append(block)
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+    data = {}
+    for name, value in handle.items():
+        if value[0] == 'csr':
+            kind, shape, specs = value
+            data[name] = sparse.csr_matrix(tuple(get(spec) for spec in specs), shape=shape, copy=False)
+        else:
+            data[name] = get(value[1])
+    return data
+
+
+'''
+
+|+++++++++++++++++|
+| release(blocks) |
+|+++++++++++++++++|
+
+frees the shared memory blocks created by 'share()'.
+
+'''
+
+def release(blocks):
+    for block in blocks:
+        block.close()
+        block.unlink()
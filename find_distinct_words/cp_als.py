@@ -0,0 +1,608 @@
+import time
+import numpy as np
+
+'''
+
+# Author: Heeryon Cho <heeryon.cho@gmail.com>
+# License: BSD-3-clause
+
+This code performs the fixed mode-3 value CP decomposition of 'tensorly_modified.py'
+using NumPy only.
+
+The decomposition follows the same alternating least squares (ALS) steps, but:
+
+1. the mode-n unfoldings of the tensor are computed once before the iterations, and
+
+2. the reconstruction error is computed from the Gram matrices of the factors,
+
+   ||X - X^||^2 = ||X||^2 - 2<X, X^> + ||X^||^2
+
+   where <X, X^> is obtained from the last MTTKRP (matricized tensor times
+   Khatri-Rao product) of the iteration, and ||X^||^2 from the (rank x rank)
+   Gram matrices. Hence, the reconstructed tensor is never materialized.
+
+With error='direct', 'parafac()' instead reproduces the numerics of 'tensorly_modified.py'
+exactly: the decomposition is computed in the dtype of the tensor (e.g., float32 word2vec
+vectors), and the error is computed from the reconstructed tensor.
+
+The 'constrained' option treats the fixed mode-3 rows as constants (see 'tensorly_modified.py').
+
+--- fixed_mode_three(n_corpora, w) : fixed mode-3 values of n_corpora corpora.
+--- parafac(tensor, rank, ...) : fixed mode-3 value CP decomposition.
+--- parafac_batch(tensors, rank, ...) : fixed mode-3 value CP decompositions of many tensors at once.
+--- parafac_blocked(slices, rank, ...) : out-of-core fixed mode-3 value CP decomposition.
+
+'''
+
+
+def _unfold(tensor, mode):
+    # Same layout as 'tensorly.base.unfold()'.
+
+    return np.reshape(np.moveaxis(tensor, mode, 0), (tensor.shape[mode], -1))
+
+
+def _khatri_rao(matrices):
+    # Same row order as 'tensorly.tenalg.khatri_rao()'.
+
+    a, b = matrices
+    return np.reshape(a[:, np.newaxis, :] * b[np.newaxis, :, :], (-1, a.shape[1]))
+
+
+def _khatri_rao_batch(matrices):
+    # Khatri-Rao products of stacked matrices (the first axis is the batch axis).
+
+    a, b = matrices
+    return np.reshape(a[:, :, np.newaxis, :] * b[:, np.newaxis, :, :], (a.shape[0], -1, a.shape[2]))
+
+
+'''
+
+|++++++++++++++++++++++++++++++++++++++++++++++++|
+| initialize_factors(tensor, rank, random_state) |
+|++++++++++++++++++++++++++++++++++++++++++++++++|
+
+initializes the factors using 'random_state' in the same way as 'tensorly_modified.py',
+so that both codes start from the same factors.
+
+'''
+
+def initialize_factors(tensor, rank, random_state=None):
+    return random_factors(tensor.shape, rank, random_state=random_state)
+
+
+def _top_bottom(factor, top):
+    # The sets (as sorted arrays) of the top & bottom 'top' rows of each column of the factor,
+    # or the whole ordering of the rows if top is None.
+
+    order = np.argsort(-factor, axis=0, kind='stable')
+    if top is None or 2 * top >= len(order):
+        return order
+    return np.concatenate([np.sort(order[:top], axis=0), np.sort(order[-top:], axis=0)])
+
+
+def random_factors(shape, rank, random_state=None):
+    # Same as 'initialize_factors()' for a tensor of the given shape.
+
+    if isinstance(random_state, np.random.RandomState):
+        rng = random_state
+    else:
+        rng = np.random.RandomState(random_state)
+
+    return [rng.random_sample((n, rank)) for n in shape]
+
+
+'''
+
+|++++++++++++++++++++++++++++++++|
+| fixed_mode_three(n_corpora, w) |
+|++++++++++++++++++++++++++++++++|
+
+returns the fixed mode-3 values (one row per corpus) of the decomposition of
+n_corpora corpora into n_corpora + 1 components: a distinct component per corpus
+weighted w, and a neutral component shared by all corpora weighted 1 - w.
+
+the components are ordered as (corpus 0, neutral, corpus 1, ..., corpus n_corpora-1),
+so that the values of two corpora are the original (ja, neu, ko) values:
+
+    fixed_mode_three(2, 0.5) = [[0.5, 0.5, 0.0],
+                                [0.0, 0.5, 0.5]]
+
+'''
+
+def fixed_mode_three(n_corpora, w=0.5):
+    fixed = np.zeros((n_corpora, n_corpora + 1))
+    for k in range(n_corpora):
+        fixed[k][k + 1 if k else 0] = w
+        fixed[k][1] = 1.0 - w
+    return fixed
+
+
+'''
+
+|+++++++++++++++++++++++++++++++++++++++++++++|
+| parafac(tensor, rank, n_iter_max, tol, ...) |
+|+++++++++++++++++++++++++++++++++++++++++++++|
+
+CANDECOMP/PARAFAC decomposition of a 3-way tensor via ALS, where the rows of
+the mode-3 factor are fixed to the 'mode_three_val' values.
+
+the arguments and the returned values are the same as 'tensorly_modified.parafac()'.
+
+--- tensor : 3-way ndarray (e.g., words x word2vec dimensions x corpora).
+--- rank : number of components.
+--- n_iter_max : maximum number of iterations.
+--- tol : the iterations stop when the variation of the relative reconstruction error is below tol.
+--- mode_three_val : fixed rows of the mode-3 factor (one row per corpus, see 'fixed_mode_three()').
+--- constrained : if True, the fixed mode-3 rows are set once and kept in the returned factors,
+                  and the mode-3 update is skipped when all the mode-3 rows are fixed. the
+                  reconstruction error is still that of the least-squares mode-3 factor, as
+                  in the original decomposition, so both stop at the same iteration with the
+                  same mode-1 & mode-2 factors (i.e., the same word rankings).
+--- init : initial factors (e.g., the factors of a previous run); if None, the factors
+           are initialized using random_state.
+--- error : 'gram' computes the reconstruction error from the Gram matrices (in float64);
+            'direct' computes it from the reconstructed tensor (in the dtype of the tensor),
+            which gives the same results as 'tensorly_modified.parafac()'.
+--- telemetry : if a list is given, a record of each iteration is appended to it:
+                the iteration, the reconstruction error, and the wall time of the iteration
+                and of its Khatri-Rao products, least-squares solves & error computation.
+--- rank_stable : if given, the iterations also stop when the top & bottom words of each mode-1
+                  component (i.e., of the sorted index words) have not changed for rank_stable iterations.
+--- rank_top : number of top (& bottom) words compared by rank_stable; their order within the
+               top & bottom words is not compared. if None, the whole word ordering is compared,
+               which rarely settles before the reconstruction error does.
+
+returns the factors (and the relative reconstruction errors if return_errors is True).
+
+'''
+
+def parafac(tensor, rank, n_iter_max=100, tol=1e-8,
+            random_state=None, verbose=False, return_errors=False,
+            mode_three_val=[[0.5, 0.5, 0.0], [0.0, 0.5, 0.5]], constrained=False, init=None,
+            error='gram', telemetry=None, rank_stable=None, rank_top=50):
+    if error == 'direct':
+        tensor = np.asarray(tensor)
+    else:
+        tensor = np.asarray(tensor, dtype=np.float64)
+    dtype = tensor.dtype
+    n_modes = tensor.ndim
+
+    if init is None:
+        init = initialize_factors(tensor, rank, random_state=random_state)
+    factors = [np.array(f, dtype=dtype) for f in init]
+    rec_errors = []
+
+    # The unfoldings and the norm of the tensor do not change over the iterations.
+
+    unfolded = [_unfold(tensor, mode) for mode in range(n_modes)]
+    norm_sq = np.sum(tensor ** 2)
+    norm_tensor = np.sqrt(norm_sq)
+
+    # Mode-3 values that control the country factors are set using the
+    # mode_three_val argument.
+
+    fixed = np.asarray(mode_three_val, dtype=np.float64)
+
+    modes = list(range(n_modes))
+    if constrained:
+        factors[2][:len(fixed)] = fixed   # set mode-3 values
+        if len(fixed) == tensor.shape[2]:
+            modes.remove(2)
+
+    # Word ordering of the mode-1 components, and the number of iterations it has not changed.
+
+    ranking = None
+    n_stable = 0
+
+    for iteration in range(n_iter_max):
+        start = time.perf_counter()
+        kr_time = 0.0
+        solve_time = 0.0
+
+        for mode in modes:
+            if not constrained:
+                factors[2][:len(fixed)] = fixed   # set mode-3 values
+
+            others = [i for i in range(n_modes) if i != mode]
+            pseudo_inverse = np.ones((rank, rank), dtype=dtype)
+            for i in others:
+                pseudo_inverse = pseudo_inverse * np.dot(factors[i].T, factors[i])
+
+            t = time.perf_counter()
+            kr = _khatri_rao([factors[i] for i in others])
+            kr_time += time.perf_counter() - t
+
+            mttkrp = np.dot(unfolded[mode], kr)
+
+            t = time.perf_counter()
+            factors[mode] = np.linalg.solve(pseudo_inverse.T, mttkrp.T).T
+            solve_time += time.perf_counter() - t
+
+            if constrained and mode == 2:
+                factors[2][:len(fixed)] = fixed   # set mode-3 values
+
+        t = time.perf_counter()
+
+        # The reconstruction error uses the mode-3 factor of the last (mode-3) update. In the
+        # constrained mode, the least-squares mode-3 factor is computed for it but not kept.
+
+        last = factors[mode]
+        if tol and constrained:
+            pseudo_inverse = np.ones((rank, rank), dtype=dtype)
+            for i in (0, 1):
+                pseudo_inverse = pseudo_inverse * np.dot(factors[i].T, factors[i])
+            mttkrp = np.dot(unfolded[2], _khatri_rao([factors[0], factors[1]]))
+            last = np.linalg.solve(pseudo_inverse.T, mttkrp.T).T
+
+        if tol and error == 'direct':
+            rec = np.reshape(np.dot(factors[0], _khatri_rao([factors[1], last]).T), tensor.shape)
+            rec_errors.append(np.sqrt(np.sum((tensor - rec) ** 2)) / norm_tensor)
+
+        elif tol:
+            # 'mttkrp' and 'pseudo_inverse' are those of the mode-3 update here.
+
+            inner = np.sum(mttkrp * last)
+            norm_rec_sq = np.sum(pseudo_inverse * np.dot(last.T, last))
+            rec_error = np.sqrt(max(norm_sq - 2 * inner + norm_rec_sq, 0.0)) / norm_tensor
+            rec_errors.append(rec_error)
+
+        error_time = time.perf_counter() - t
+
+        if rank_stable:
+            new_ranking = _top_bottom(factors[0], rank_top)
+            changed = ranking is None or not np.array_equal(ranking, new_ranking)
+            n_stable = 0 if changed else n_stable + 1
+            ranking = new_ranking
+
+        if telemetry is not None:
+            record = {'iteration': iteration,
+                      'error': float(rec_errors[-1]) if tol else None,
+                      'time': time.perf_counter() - start,
+                      'khatri_rao_time': kr_time,
+                      'solve_time': solve_time,
+                      'error_time': error_time}
+            if rank_stable:
+                record['ranking_changed'] = bool(changed)
+            telemetry.append(record)
+
+        if rank_stable and n_stable >= rank_stable:
+            if verbose:
+                print('top & bottom words stable for {} iterations; stopped in {} iterations.'.format(
+                    rank_stable, iteration))
+            break
+
+        if tol and iteration > 1:
+            if verbose:
+                print('reconstruction error={}, variation={}.'.format(
+                    rec_errors[-1], rec_errors[-2] - rec_errors[-1]))
+
+            if abs(rec_errors[-2] - rec_errors[-1]) < tol:
+                if verbose:
+                    print('converged in {} iterations.'.format(iteration))
+                break
+
+    if return_errors:
+        return factors, rec_errors
+    else:
+        return factors
+
+
+'''
+
+|++++++++++++++++++++++++++++++++++++++++++++++++++++|
+| parafac_batch(tensors, rank, n_iter_max, tol, ...) |
+|++++++++++++++++++++++++++++++++++++++++++++++++++++|
+
+decomposes many tensors of the same shape (e.g., the tensors of many word2vec seeds)
+simultaneously using stacked arrays, i.e., batched matrix products & solves.
+
+each tensor is decomposed in the same way as 'parafac()' with the same random_state.
+a tensor stops being updated once its reconstruction error converged, while the
+other tensors continue to be updated.
+
+--- tensors : list of 3-way ndarrays of the same shape, or a 4-way ndarray (tensors stacked on axis 0).
+--- init : list of the initial factors of each tensor; an item is None for
+           the tensors that start from the random factors.
+
+returns the list of factors of each tensor (and the list of the relative reconstruction
+errors of each tensor if return_errors is True).
+
+'''
+
+def parafac_batch(tensors, rank, n_iter_max=100, tol=1e-8,
+                  random_state=None, verbose=False, return_errors=False,
+                  mode_three_val=[[0.5, 0.5, 0.0], [0.0, 0.5, 0.5]], constrained=False, init=None):
+    tensors = np.asarray(tensors, dtype=np.float64)
+    n_tensors, n_rows, n_cols, n_corpora = tensors.shape
+
+    # All the tensors start from the same factors, as 'parafac()' with the same random_state.
+
+    random_init = initialize_factors(tensors[0], rank, random_state=random_state)
+    factors = [np.repeat(f[np.newaxis], n_tensors, axis=0) for f in random_init]
+
+    if init is not None:
+        for t, init_t in enumerate(init):
+            if init_t is not None:
+                for i in range(3):
+                    factors[i][t] = init_t[i]
+    rec_errors = [[] for _ in range(n_tensors)]
+
+    norm_sq = np.sum(tensors ** 2, axis=(1, 2, 3))
+
+    # Stacked MTTKRPs of the three modes. (The mode-1 unfoldings are reshaped views of the tensors.)
+
+    def mttkrp(stacked, current, mode):
+        if mode == 0:
+            unfolded = np.reshape(stacked, (len(stacked), n_rows, n_cols * n_corpora))
+            return np.matmul(unfolded, _khatri_rao_batch([current[1], current[2]]))
+        elif mode == 1:
+            return np.einsum('sijk,sir,skr->sjr', stacked, current[0], current[2], optimize=True)
+        else:
+            return np.einsum('sijk,sir,sjr->skr', stacked, current[0], current[1], optimize=True)
+
+    # Mode-3 values that control the country factors are set using the
+    # mode_three_val argument.
+
+    fixed = np.asarray(mode_three_val, dtype=np.float64)
+
+    modes = [0, 1, 2]
+    if constrained:
+        factors[2][:, :len(fixed)] = fixed   # set mode-3 values
+        if len(fixed) == n_corpora:
+            modes.remove(2)
+
+    # Only the tensors that have not converged yet are updated. Their tensors, factors
+    # and norms are packed into smaller arrays whenever some tensors converge.
+
+    idx = np.arange(n_tensors)
+    current = [f.copy() for f in factors]
+    tensors_active = tensors
+    norm_sq_active = norm_sq
+
+    for iteration in range(n_iter_max):
+        for mode in modes:
+            if not constrained:
+                current[2][:, :len(fixed)] = fixed   # set mode-3 values
+
+            pseudo_inverse = np.ones((rank, rank))
+            for i in range(3):
+                if i != mode:
+                    pseudo_inverse = pseudo_inverse * np.matmul(np.transpose(current[i], (0, 2, 1)), current[i])
+
+            # The (rank x rank) systems are solved for all rows at once using their inverses.
+
+            product = mttkrp(tensors_active, current, mode)
+            current[mode] = np.matmul(product, np.linalg.inv(pseudo_inverse))
+
+            if constrained and mode == 2:
+                current[2][:, :len(fixed)] = fixed   # set mode-3 values
+
+        if tol:
+            # 'product' and 'pseudo_inverse' are those of the mode-3 update here (see 'parafac()'
+            # for the constrained mode).
+
+            last = current[mode]
+            if constrained:
+                pseudo_inverse = np.ones((rank, rank))
+                for i in (0, 1):
+                    pseudo_inverse = pseudo_inverse * np.matmul(np.transpose(current[i], (0, 2, 1)), current[i])
+                product = mttkrp(tensors_active, current, 2)
+                last = np.matmul(product, np.linalg.inv(pseudo_inverse))
+
+            inner = np.sum(product * last, axis=(1, 2))
+            gram = np.matmul(np.transpose(last, (0, 2, 1)), last)
+            norm_rec_sq = np.sum(pseudo_inverse * gram, axis=(1, 2))
+            rec_error = np.sqrt(np.maximum(norm_sq_active - 2 * inner + norm_rec_sq, 0.0)) / np.sqrt(norm_sq_active)
+
+            converged = np.zeros(len(idx), dtype=bool)
+            for j, t in enumerate(idx):
+                rec_errors[t].append(rec_error[j])
+                if iteration > 1 and abs(rec_errors[t][-2] - rec_errors[t][-1]) < tol:
+                    converged[j] = True
+                    if verbose:
+                        print('tensor {} converged in {} iterations.'.format(t, iteration))
+
+            if converged.any():
+                for i in range(3):
+                    factors[i][idx[converged]] = current[i][converged]
+
+                keep = ~converged
+                idx = idx[keep]
+                current = [c[keep] for c in current]
+                tensors_active = tensors_active[keep]
+                norm_sq_active = norm_sq_active[keep]
+
+                if verbose:
+                    print('iteration {}: {} tensors left.'.format(iteration, len(idx)))
+
+                if len(idx) == 0:
+                    break
+
+    # Factors of the tensors that did not converge within n_iter_max iterations.
+
+    for i in range(3):
+        factors[i][idx] = current[i]
+
+    factors = [[f[t] for f in factors] for t in range(n_tensors)]
+
+    if return_errors:
+        return factors, rec_errors
+    else:
+        return factors
+
+
+'''
+
+|++++++++++++++++++++++++++++++++++++++++++++++++|
+| parafac_blocked(slices, rank, block_rows, ...) |
+|++++++++++++++++++++++++++++++++++++++++++++++++|
+
+out-of-core version of 'parafac()' (with error='gram'), where the tensor is given as
+its mode-3 slices, i.e., one (words x dimensions) array per corpus, such as the
+memory-mapped vectors of the word2vec models. the slices are never stacked.
+
+the slices are read in blocks of block_rows rows, so the memory used by the tensor
+is that of one block of each slice regardless of the number of words. since the mode-1
+update of a row only depends on the same row of the slices, a whole ALS iteration
+needs a single pass over the blocks:
+
+1. the mode-1 rows of a block are updated from the block, and
+
+2. the (dimensions x rank) products G_k = S_k^T A of each slice S_k with the updated
+   mode-1 factor A are accumulated over the blocks.
+
+the MTTKRPs of modes 2 & 3 and the inner product <X, X^> of the reconstruction
+error are then computed from G_k and the (small) mode-2 & mode-3 factors.
+
+--- slices : list of 2-way arrays (one per corpus); may be np.memmap arrays.
+--- block_rows : number of rows of the slices read at a time.
+--- rows : list of row indices (one array per slice, or None for all of its rows) selecting the
+           rows of the tensor from the slices. the rows of each block are gathered from the
+           slices separately, so the selected rows are never copied as a whole.
+
+the other arguments and the returned values are the same as 'parafac()'.
+the results are those of 'parafac()' up to the rounding errors of the blockwise sums.
+
+'''
+
+def parafac_blocked(slices, rank, block_rows=100000, n_iter_max=100, tol=1e-8,
+                    random_state=None, verbose=False, return_errors=False,
+                    mode_three_val=[[0.5, 0.5, 0.0], [0.0, 0.5, 0.5]], constrained=False, init=None,
+                    telemetry=None, rank_stable=None, rank_top=50, rows=None):
+    n_corpora = len(slices)
+    if rows is None:
+        rows = [None] * n_corpora
+    n_rows = len(rows[0]) if rows[0] is not None else slices[0].shape[0]
+    n_cols = slices[0].shape[1]
+
+    def read(k, start, stop):
+        # Rows start:stop of the k-th slice of the tensor.
+
+        s = slices[k][start:stop] if rows[k] is None else slices[k][rows[k][start:stop]]
+        return np.asarray(s, dtype=np.float64)
+
+    if init is None:
+        init = random_factors((n_rows, n_cols, n_corpora), rank, random_state=random_state)
+    factors = [np.array(f, dtype=np.float64) for f in init]
+    rec_errors = []
+
+    blocks = [(start, min(start + block_rows, n_rows)) for start in range(0, n_rows, block_rows)]
+
+    # The norm of the tensor does not change over the iterations.
+
+    norm_sq = 0.0
+    for start, stop in blocks:
+        for k in range(n_corpora):
+            norm_sq += np.sum(read(k, start, stop) ** 2)
+    norm_tensor = np.sqrt(norm_sq)
+
+    # Mode-3 values that control the country factors are set using the
+    # mode_three_val argument.
+
+    fixed = np.asarray(mode_three_val, dtype=np.float64)
+
+    modes = [1, 2]
+    if constrained:
+        factors[2][:len(fixed)] = fixed   # set mode-3 values
+        if len(fixed) == n_corpora:
+            modes.remove(2)
+
+    # Word ordering of the mode-1 components, and the number of iterations it has not changed.
+
+    ranking = None
+    n_stable = 0
+
+    for iteration in range(n_iter_max):
+        start_time = time.perf_counter()
+
+        # Mode 1: blockwise update, accumulating G_k = S_k^T A and the Gram matrix of A.
+
+        if not constrained:
+            factors[2][:len(fixed)] = fixed   # set mode-3 values
+
+        pseudo_inverse = np.dot(factors[1].T, factors[1]) * np.dot(factors[2].T, factors[2])
+        inverse = np.linalg.inv(pseudo_inverse)
+
+        G = np.zeros((n_corpora, n_cols, rank))
+        gram_a = np.zeros((rank, rank))
+        for start, stop in blocks:
+            block = [read(k, start, stop) for k in range(n_corpora)]
+
+            mttkrp = np.zeros((stop - start, rank))
+            for k in range(n_corpora):
+                mttkrp += np.dot(block[k], factors[1]) * factors[2][k]
+            a = np.dot(mttkrp, inverse)
+            factors[0][start:stop] = a
+
+            for k in range(n_corpora):
+                G[k] += np.dot(block[k].T, a)
+            gram_a += np.dot(a.T, a)
+
+        # Modes 2 & 3: MTTKRPs from G_k.
+
+        for mode in modes:
+            if not constrained:
+                factors[2][:len(fixed)] = fixed   # set mode-3 values
+
+            if mode == 1:
+                pseudo_inverse = gram_a * np.dot(factors[2].T, factors[2])
+                mttkrp = np.einsum('kjr,kr->jr', G, factors[2])
+            else:
+                pseudo_inverse = gram_a * np.dot(factors[1].T, factors[1])
+                mttkrp = np.einsum('kjr,jr->kr', G, factors[1])
+
+            factors[mode] = np.linalg.solve(pseudo_inverse.T, mttkrp.T).T
+
+            if constrained and mode == 2:
+                factors[2][:len(fixed)] = fixed   # set mode-3 values
+
+        if tol:
+            # 'mttkrp' and 'pseudo_inverse' are those of the mode-3 update here (see 'parafac()'
+            # for the constrained mode).
+
+            last = factors[mode]
+            if constrained:
+                pseudo_inverse = gram_a * np.dot(factors[1].T, factors[1])
+                mttkrp = np.einsum('kjr,jr->kr', G, factors[1])
+                last = np.linalg.solve(pseudo_inverse.T, mttkrp.T).T
+
+            inner = np.sum(mttkrp * last)
+            norm_rec_sq = np.sum(pseudo_inverse * np.dot(last.T, last))
+            rec_error = np.sqrt(max(norm_sq - 2 * inner + norm_rec_sq, 0.0)) / norm_tensor
+            rec_errors.append(rec_error)
+
+        if rank_stable:
+            new_ranking = _top_bottom(factors[0], rank_top)
+            changed = ranking is None or not np.array_equal(ranking, new_ranking)
+            n_stable = 0 if changed else n_stable + 1
+            ranking = new_ranking
+
+        if telemetry is not None:
+            record = {'iteration': iteration,
+                      'error': float(rec_errors[-1]) if tol else None,
+                      'time': time.perf_counter() - start_time,
+                      'n_blocks': len(blocks)}
+            if rank_stable:
+                record['ranking_changed'] = bool(changed)
+            telemetry.append(record)
+
+        if rank_stable and n_stable >= rank_stable:
+            if verbose:
+                print('top & bottom words stable for {} iterations; stopped in {} iterations.'.format(
+                    rank_stable, iteration))
+            break
+
+        if tol and iteration > 1:
+            if verbose:
+                print('reconstruction error={}, variation={}.'.format(
+                    rec_errors[-1], rec_errors[-2] - rec_errors[-1]))
+
+            if abs(rec_errors[-2] - rec_errors[-1]) < tol:
+                if verbose:
+                    print('converged in {} iterations.'.format(iteration))
+                break
+
+    if return_errors:
+        return factors, rec_errors
+    else:
+        return factors
@@ -1,10 +1,13 @@
 import os
 import csv
 import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
+from multiprocessing import Pool
+from scipy import sparse
+from sklearn.preprocessing import normalize
 from sklearn.cluster import KMeans
 from sklearn.metrics import adjusted_rand_score
 from find_distinct_words import common_func
+from find_distinct_words import cooccur
 from pylab import *
 
 
@@ -45,16 +48,15 @@ def baseline():
     if not os.path.exists(table_dir):
         os.makedirs(table_dir)
 
-    # Load filtered lyrics data and y_label.
+    # Load the document-term counts of the filtered lyrics data and y_label,
+    # and perform the tf-idf transformation on all words.
 
-    lyrics_ja, lyrics_ko, label = common_func.load_xy()
+    corpus = cooccur.count_corpus()
+    vocab = corpus['vocab']
 
-    lyrics_all = lyrics_ja + lyrics_ko
-
-    tfidf = TfidfVectorizer(preprocessor=lambda x: x, tokenizer=lambda x: x)
-    vect = tfidf.fit_transform(lyrics_all)
+    vect, label = tfidf_matrix(corpus['counts'], corpus['label'], np.ones(len(vocab), dtype=bool))
     print("# tfidf vect shape:", vect.shape)
-    print("# tfidf vect features:", tfidf.get_feature_names()[:3])
+    print("# tfidf vect features:", list(vocab[:3]))
 
     num_clusters = 2
 
@@ -85,202 +87,307 @@ def baseline():
 
 '''
 
-|++++++++++++++++|
-| top_x_bottom() |
-|++++++++++++++++|
+|+++++++++++++++++++++++++++++++++++|
+| tfidf_matrix(counts, label, mask) |
+|+++++++++++++++++++++++++++++++++++|
+
+derives the tf-idf matrix of the selected words from the document-term count matrix.
+
+the selected columns are sliced out, lyrics that contain none of the selected
+words are dropped, and the result is reweighted and renormalized exactly as
+TfidfVectorizer(smooth_idf=True, norm='l2') would do on the selected words.
+
+returns the tf-idf matrix and the labels of the remaining lyrics.
+
+'''
+
+def tfidf_matrix(counts, label, mask):
+    # Slice the selected words and drop the lyrics that became empty.
+
+    selected = counts[:, np.flatnonzero(mask)]
+    nonempty = np.diff(selected.indptr) > 0
+    selected = selected[nonempty]
+
+    # Drop the selected words that do not appear in any remaining lyric.
+
+    df = np.bincount(selected.indices, minlength=selected.shape[1])
+    selected = selected[:, np.flatnonzero(df)]
+    df = df[df > 0]
+
+    # Smoothed idf weighting followed by l2 normalization.
+
+    n_docs = selected.shape[0] + 1
+    idf = np.log(float(n_docs) / (df + 1.0)) + 1.0
+
+    # The matrix is rebuilt from its arrays rather than converted with astype(), which would
+    # sort the words of each row (see 'cooccur.doc_term_counts()').
+
+    vect = sparse.csr_matrix((selected.data.astype(np.float64), selected.indices, selected.indptr),
+                             shape=selected.shape)
+    vect.data *= idf[vect.indices]
+    vect = normalize(vect, norm='l2', copy=False)
+
+    return vect, label[nonempty]
+
+
+'''
+
+|+++++++++++++++++++++++++++++|
+| word_rank(vocab, word_list) |
+|+++++++++++++++++++++++++++++|
+
+returns the rank of each vocabulary word in the given (sorted) word list.
+vocabulary words that are not in the word list are never selected.
+
+'''
+
+def word_rank(vocab, word_list):
+    rank = {w: i for i, w in enumerate(word_list)}
+    not_ranked = np.iinfo(np.int64).max
+    return np.array([rank.get(w, not_ranked) for w in vocab], dtype=np.int64)
+
+
+# Document-term counts, labels and CPD word ranks shared by the experiment worker
+# processes. These variables are only set by the _init_experiment_worker() function below.
+
+_counts = None
+_label_all = None
+_ranks = None
+
+
+def _init_experiment_worker(data=None, handle=None):
+    # The worker processes read the data from shared memory (see 'cooccur.share()').
+
+    global _counts, _label_all, _ranks
+    if handle is not None:
+        data = cooccur.attach(handle)
+    _counts = data['counts']
+    _label_all = data['label']
+    _ranks = {'t': (data['top_ja'], data['top_ko']),
+              'b': (data['bottom_ja'], data['bottom_ko'])}
+
+
+def _cluster_setting(setting):
+    # Clusters the lyrics using the top-n/bottom-n J-pop & K-pop CPD words of a
+    # (case, n) setting, e.g., ("tb", 50) for top-50 J-pop & bottom-50 K-pop words.
+
+    case, top_n = setting
+    rank_ja = _ranks[case[0]][0]
+    rank_ko = _ranks[case[1]][1]
+
+    mask = (rank_ja < top_n) | (rank_ko < top_n)
+
+    # Perform term frequency-index document frequency transformation
+    # on the top-n/bottom-n J-pop & K-pop words of the count matrix.
+
+    vect, label = tfidf_matrix(_counts, _label_all, mask)
+
+    num_clusters = 2  # Clusters J-pop lyrics data and K-pop lyrics data.
+
+    ari_list = []
+
+    # Experiment 5 clustering trials with 5 different fixed seeds.
+    # This is done for fair comparison among different mode-2 values.
+
+    # To save execution time, one trial experiment is conducted instead of five.
+    # for i in range(5):
+    for i in range(1):
+        # Perform k-means clustering.
+
+        km = KMeans(n_clusters=num_clusters, random_state=i)
+        y_predict = km.fit_predict(vect)
+
+        # Adjusted rand score is used to evaluate the clustering result.
+
+        ari = adjusted_rand_score(y_predict, label)
+        #print("trial_{}: ari={:.5f}".format(i + 1, ari))
+
+        ari_list.append(ari)
+
+    return int(mask.sum()), int(np.sum(label == 1)), int(np.sum(label == 0)), vect.shape, ari
+
+
+'''
+
+|+++++++++++++++++++++++++++++++++++|
+| top_x_bottom(step, max_n, n_jobs) |
+|+++++++++++++++++++++++++++++++++++|
 
 calculates the average clustering performance of the multi-trial experiments
 using various top_n/bottom_n X bottom_n/top_n, j-pop and k-pop CPD words.
 
 a 2 X 2 = 4 cases of clustering performances are investigated.
 
+the n words of the sweep are saved to 'table/top_n.csv' (see 'load_sweep()').
+
+the (case, n) settings are clustered by n_jobs worker processes, which read the
+count matrix & the CPD word ranks from shared memory; the results are printed
+and saved in the same order as with n_jobs=1.
+
 '''
 
-def top_x_bottom():
+def top_x_bottom(step=50, max_n=1000, n_jobs=1):
     # Create 'table' directory if there isn't any.
 
     table_dir = "table"
     if not os.path.exists(table_dir):
         os.makedirs(table_dir)
 
-    # Load data and y_label.
+    # Load the document-term count matrix of the filtered lyrics data and y_label,
+    # which are built once; each N/case selection is then done with a boolean
+    # vocabulary mask over its columns.
+
+    corpus = cooccur.count_corpus()
+    vocab = corpus['vocab']
+
+    # Load CPD word list.
+
+    ja, ko, neu = common_func.load_word_list()
 
-    lyrics_ja, lyrics_ko, label = common_func.load_xy()
+    # Rank of each vocabulary word in the CPD word lists; the reversed
+    # lists are used to retrieve bottom-n words. The top-n/bottom-n
+    # selections of N=step,2*step,... are nested prefixes of these ranks.
+
+    data = {'counts': corpus['counts'], 'label': corpus['label'],
+            'top_ja': word_rank(vocab, ja), 'top_ko': word_rank(vocab, ko),
+            'bottom_ja': word_rank(vocab, list(reversed(ja))),
+            'bottom_ko': word_rank(vocab, list(reversed(ko)))}
 
     # 4 cases are tested: top-top, top-bottom, bottom-top, bottom-bottom (J-pop vs. K-pop).
 
     cases = ["tt", "tb", "bt", "bb"]
+    settings = [(case, top_n) for case in cases for top_n in range(step, max_n + 1, step)]
+
+    # Save the n words of the sweep, i.e., the columns of the 'ari_*.csv' & 'num_words_*.csv' results.
+
+    f_top_n = "{}/top_n.csv".format(table_dir)
+    with open(f_top_n, "w") as f:
+        writer = csv.writer(f)
+        writer.writerows([list(range(step, max_n + 1, step))])
+
+    # The pool is terminated and the shared memory released even if a setting fails.
 
-    for case in cases:
-        if case is "tt":
-            print("\n\n=========================================================")
-            print("                     ja_TOP X ko_TOP                     ")
-            print("=========================================================")
-
-        if case is "tb":
-            print("\n\n=========================================================")
-            print("                    ja_TOP X ko_BOTTOM                   ")
-            print("=========================================================")
-
-        if case is "bt":
-            print("\n\n=========================================================")
-            print("                    ja_BOTTOM X ko_TOP                   ")
-            print("=========================================================")
-
-        if case is "bb":
-            print("\n\n=========================================================")
-            print("                ja_BOTTOM X ko_BOTTOM                    ")
-            print("=========================================================")
-
-        # Container for the Adjusted Rand Index (ARI) output using various mode-3 value CPD results, and
-        # number of j-pop + k-pop index words used in the clustering.
-
-        result_ari = []
-        result_n_w = []
-
-        #tmp_ari = []
-        #tmp_n_w = []
-
-        # Load CPD word list.
-
-        ja, ko, neu = common_func.load_word_list()
-
-        # Reverse the list; this is done to retrieve bottom-n words.
-
-        rev_ja = list(reversed(ja))
-        rev_ko = list(reversed(ko))
-
-        for top_n in range(50, 1050, 50):
-            # *** Top-N vs. Top-N *** -------------------------------------------------------
-            if case is "tt":
-                print("\n****** TOP-N: {} X 2 (J-pop/K-pop) ******\n".format(top_n))
-                words_ja = ja[:top_n]
-                words_ko = ko[:top_n]
-            # --------------------------------------------------------------------------------
-
-            # *** Bottom-N vs. Bottom-N *** -------------------------------------------------
-            if case is "bb":
-                print("\n****** BOTTOM-N: {} X 2 (J-pop/K-pop) ******\n".format(top_n))
-                words_ja = rev_ja[:top_n]
-                words_ko = rev_ko[:top_n]
-            # --------------------------------------------------------------------------------
+    pool = None
+    blocks = []
+    try:
+        if n_jobs == 1:
+            _init_experiment_worker(data)
+            outputs = map(_cluster_setting, settings)
+        else:
+            handle, blocks = cooccur.share(data)
+            pool = Pool(processes=n_jobs, initializer=_init_experiment_worker, initargs=(None, handle))
+            outputs = pool.imap(_cluster_setting, settings)
 
-            # *** Top-N vs. Bottom-N *** -------------------------------------------------
-            if case is "tb":
-                print("\n****** TOP-N (J-pop) {} & BOTTOM-N (K-pop) {} ******\n".format(top_n, top_n))
-                words_ja = ja[:top_n]
-                words_ko = rev_ko[:top_n]
-            # --------------------------------------------------------------------------------
+        # imap() yields the results in the order of the settings.
 
-            # *** Bottom-N vs. Top-N *** -------------------------------------------------
-            if case is "bt":
-                print("\n****** BOTTOM-N (J-pop) {} & TOP-N (K-pop) {} ******\n".format(top_n, top_n))
-                words_ja = rev_ja[:top_n]
-                words_ko = ko[:top_n]
-            # --------------------------------------------------------------------------------
+        for case in cases:
+            if case == "tt":
+                print("\n\n=========================================================")
+                print("                     ja_TOP X ko_TOP                     ")
+                print("=========================================================")
 
-            words = words_ja + words_ko
-            print("# of selected words (uniq):", len(set(words)))
-            result_n_w.append(len(set(words)))
+            if case == "tb":
+                print("\n\n=========================================================")
+                print("                    ja_TOP X ko_BOTTOM                   ")
+                print("=========================================================")
 
-            lyrics_ja_added = []
-            for lyric in lyrics_ja:
-                tmp = []
-                for w in lyric:
-                    # -----------------------------
-                    # Select top-n/bottom-n J-pop words from the filtered J-pop lyrics data.
-                    if w in words:
-                        tmp.append(w)
-                    # -----------------------------
-                if tmp != []:
-                    lyrics_ja_added.append(tmp)
-            print("lyrics ja added:", len(lyrics_ja_added))
+            if case == "bt":
+                print("\n\n=========================================================")
+                print("                    ja_BOTTOM X ko_TOP                   ")
+                print("=========================================================")
 
-            lyrics_ko_added = []
-            for lyric in lyrics_ko:
-                tmp = []
-                for w in lyric:
-                    # -----------------------------
-                    # Select top-n/bottom-n K-pop words from the filtered K-pop lyrics data.
-                    if w in words:
-                        tmp.append(w)
-                    # -----------------------------
-                if tmp != []:
-                    lyrics_ko_added.append(tmp)
-            print("lyrics ko added:", len(lyrics_ko_added))
+            if case == "bb":
+                print("\n\n=========================================================")
+                print("                ja_BOTTOM X ko_BOTTOM                    ")
+                print("=========================================================")
 
-            # Merge two lyrics data.
+            # Container for the Adjusted Rand Index (ARI) output using various mode-3 value CPD results, and
+            # number of j-pop + k-pop index words used in the clustering.
 
-            lyrics_all_added = lyrics_ja_added + lyrics_ko_added
+            result_ari = []
+            result_n_w = []
 
-            label_ja = [1] * len(lyrics_ja_added)
-            label_ko = [0] * len(lyrics_ko_added)
-            label = label_ja + label_ko
+            for top_n in range(step, max_n + 1, step):
+                if case == "tt":
+                    print("\n****** TOP-N: {} X 2 (J-pop/K-pop) ******\n".format(top_n))
 
-            # Perform term frequency-index document frequency transformation.
+                if case == "bb":
+                    print("\n****** BOTTOM-N: {} X 2 (J-pop/K-pop) ******\n".format(top_n))
 
-            tfidf = TfidfVectorizer(preprocessor=lambda x: x, tokenizer=lambda x: x)
-            vect = tfidf.fit_transform(lyrics_all_added)
-            print("# tfidf vect shape:", vect.shape)
-            # print("# tfidf vect features:", tfidf.get_feature_names()[:3])
+                if case == "tb":
+                    print("\n****** TOP-N (J-pop) {} & BOTTOM-N (K-pop) {} ******\n".format(top_n, top_n))
 
-            num_clusters = 2  # Clusters J-pop lyrics data and K-pop lyrics data.
+                if case == "bt":
+                    print("\n****** BOTTOM-N (J-pop) {} & TOP-N (K-pop) {} ******\n".format(top_n, top_n))
 
-            ari_list = []
+                n_w, n_ja, n_ko, shape, ari = next(outputs)
 
-            # Experiment 5 clustering trials with 5 different fixed seeds.
-            # This is done for fair comparison among different mode-2 values.
+                print("# of selected words (uniq):", n_w)
+                result_n_w.append(n_w)
 
-            # To save execution time, one trial experiment is conducted instead of five.
-            # for i in range(5):
-            for i in range(1):
-                # Perform k-means clustering.
+                print("lyrics ja added:", n_ja)
+                print("lyrics ko added:", n_ko)
+                print("# tfidf vect shape:", shape)
 
-                km = KMeans(n_clusters=num_clusters, random_state=i)
-                y_predict = km.fit_predict(vect)
+                if case == "tt":
+                    print("\n--- J-pop & K-pop CPD WORDS: TOP-{} & TOP-{} ---".format(top_n, top_n))
 
-                # Adjusted rand score is used to evaluate the clustering result.
+                if case == "bb":
+                    print("\n--- J-pop & K-pop CPD WORDS: BOTTOM-{} & BOTTOM-{} ---".format(top_n, top_n))
 
-                ari = adjusted_rand_score(y_predict, label)
-                #print("trial_{}: ari={:.5f}".format(i + 1, ari))
+                if case == "tb":
+                    print("\n--- J-pop & K-pop CPD WORDS: TOP-{} & BOTTOM-{} ---".format(top_n, top_n))
 
-                ari_list.append(ari)
-
-            # Calculate the mean ARI performance of five trials.
-
-            #mean_ari = float(sum(ari_list)) / max(len(ari_list), 1)
-
-            if case is "tt":
-                print("\n--- J-pop & K-pop CPD WORDS: TOP-{} & TOP-{} ---".format(top_n, top_n))
-
-            if case is "bb":
-                print("\n--- J-pop & K-pop CPD WORDS: BOTTOM-{} & BOTTOM-{} ---".format(top_n, top_n))
+                if case == "bt":
+                    print("\n--- J-pop & K-pop CPD WORDS: BOTTOM-{} & TOP-{} ---".format(top_n, top_n))
 
-            if case is "tb":
-                print("\n--- J-pop & K-pop CPD WORDS: TOP-{} & BOTTOM-{} ---".format(top_n, top_n))
+                print("ARI={:.5f}".format(round(ari, 5)))
 
-            if case is "bt":
-                print("\n--- J-pop & K-pop CPD WORDS: BOTTOM-{} & TOP-{} ---".format(top_n, top_n))
+                result_ari.append(round(ari, 5))
 
-            #print("ARI: {:.5f}".format(round(mean_ari, 5)))
-            print("ARI={:.5f}".format(round(ari, 5)))
+            # Save results to file.
 
-            #result_ari.append(mean_ari)
-            result_ari.append(round(ari, 5))
+            f_ari = "{}/ari_{}.csv".format(table_dir, case)
+            with open(f_ari, "w") as f:
+                writer = csv.writer(f)
+                writer.writerows([result_ari])
 
-        # Save results to file.
+            f_n_w = "{}/num_words_{}.csv".format(table_dir, case)
+            with open(f_n_w, "w") as f:
+                writer = csv.writer(f)
+                writer.writerows([result_n_w])
 
-        f_ari = "{}/ari_{}.csv".format(table_dir, case)
-        with open(f_ari, "w") as f:
-            writer = csv.writer(f)
-            writer.writerows([result_ari])
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if pool is not None:
+            pool.terminate()
+        cooccur.release(blocks)
 
-        f_n_w = "{}/num_words_{}.csv".format(table_dir, case)
-        with open(f_n_w, "w") as f:
-            writer = csv.writer(f)
-            writer.writerows([result_n_w])
 
-def draw_line_graph():
+'''
+
+|++++++++++++++++++|
+| load_sweep(case) |
+|++++++++++++++++++|
+
+loads the results of a case (e.g., 'tt') of 'top_x_bottom()'.
+
+returns the n words of the sweep ('table/top_n.csv') and the clustering performance
+of each n ('table/ari_{case}.csv').
+
+'''
+
+def load_sweep(case):
+    t = pd.read_csv("table/top_n.csv", header=None).iloc[[0]].values[0]
+    data = pd.read_csv("table/ari_{}.csv".format(case), header=None).iloc[[0]].values[0]
+    if len(t) != len(data):
+        raise ValueError("'table/top_n.csv' and 'table/ari_{}.csv' have different lengths.".format(case))
+    return t, data
+
+
+def draw_line_graph(show_graph=True):
     # Create 'fig' directory if there isn't any.
 
     fig_dir = "fig"
@@ -290,25 +397,16 @@ def draw_line_graph():
     in_file_tfidf = "table/tfidf.txt"
     with open(in_file_tfidf,"r") as f:
         tfidf = f.read()
-    data_tfidf = np.full((20,), np.round(float(tfidf), 5))
 
-    in_file_tt = "table/ari_tt.csv"
-    df_tt = pd.read_csv(in_file_tt, header=None)
-    data_tt = np.round(df_tt.iloc[[0]].values[0], 5)
+    # The n words are read with the results, so the graph matches the sweep that produced them.
 
-    in_file_bb = "table/ari_bb.csv"
-    df_bb = pd.read_csv(in_file_bb, header=None)
-    data_bb = np.round(df_bb.iloc[[0]].values[0], 5)
+    t, data_tt = load_sweep("tt")
+    data_tt = np.round(data_tt, 5)
+    data_tfidf = np.full(t.shape, np.round(float(tfidf), 5))
 
-    in_file_tb = "table/ari_tb.csv"
-    df_tb = pd.read_csv(in_file_tb, header=None)
-    data_tb = np.round(df_tb.iloc[[0]].values[0], 5)
-
-    in_file_bt = "table/ari_bt.csv"
-    df_bt = pd.read_csv(in_file_bt, header=None)
-    data_bt = np.round(df_bt.iloc[[0]].values[0], 5)
-
-    t = arange(50, 1050, 50)
+    data_bb = np.round(load_sweep("bb")[1], 5)
+    data_tb = np.round(load_sweep("tb")[1], 5)
+    data_bt = np.round(load_sweep("bt")[1], 5)
 
     plot(t, data_tt, linestyle="-", label="jako_both_TOP", marker="o")
     plot(t, data_bb, linestyle="--", label="jako_both_BOTTOM", marker="+")
@@ -326,9 +424,168 @@ def draw_line_graph():
     title("K-Means Clustering With Various N Words")
     grid(True)
     savefig("fig/clustering_performance.png")
-    show()
+    if show_graph:
+        show()
     plt.gcf().clear()
 
+'''
+
+|++++++++++++++++|
+| best_setting() |
+|++++++++++++++++|
+
+picks the n words and the top/bottom ordering of J-pop & K-pop CPD words
+that gave the best clustering performance in the 'table/ari_*.csv' results
+(see 'load_sweep()').
+
+ties are broken in favor of the smaller n.
+
+returns (n_words, label_jpop, label_kpop), where the labels are either 't' or 'b'.
+
+'''
+
+def best_setting():
+    best = None
+    for case in ["tt", "tb", "bt", "bb"]:
+        t, data = load_sweep(case)
+        i = int(np.argmax(data))
+        if best is None or data[i] > best[0] or (data[i] == best[0] and t[i] < best[1]):
+            best = (data[i], int(t[i]), case)
+
+    ari, n_words, case = best
+    print("best setting: n={}, ja={}, ko={} (ARI={:.5f})".format(n_words, case[0], case[1], ari))
+
+    return n_words, case[0], case[1]
+
+
+'''
+
+|++++++++++++++++++++++++++|
+| smallest_setting(margin) |
+|++++++++++++++++++++++++++|
+
+picks the smallest n words (and the top/bottom ordering of J-pop & K-pop CPD words)
+whose clustering performance in the 'table/ari_*.csv' results (see 'load_sweep()') beats the
+tf-idf baseline ('table/tfidf.txt') by more than margin.
+
+ties are broken in the order of the cases: tt, tb, bt, bb.
+
+returns (n_words, label_jpop, label_kpop), or None if no setting beats the baseline.
+
+'''
+
+def smallest_setting(margin=0.0):
+    with open("table/tfidf.txt", "r") as f:
+        threshold = float(f.read()) + margin
+
+    best = None
+    for case in ["tt", "tb", "bt", "bb"]:
+        t, data = load_sweep(case)
+        beats = np.flatnonzero(data > threshold)
+        if len(beats) > 0 and (best is None or t[beats[0]] < best[0]):
+            best = (int(t[beats[0]]), case, data[beats[0]])
+
+    if best is None:
+        print("no setting beats the baseline by {}.".format(margin))
+        return None
+
+    n_words, case, ari = best
+    print("smallest setting: n={}, ja={}, ko={} (ARI={:.5f})".format(n_words, case[0], case[1], ari))
+
+    return n_words, case[0], case[1]
+
+
+'''
+
+|+++++++++++++++++++++++++++++++++++++++++++++++++++|
+| search_setting(margin, coarse_step, max_n, min_n) |
+|+++++++++++++++++++++++++++++++++++++++++++++++++++|
+
+searches the smallest n words (and the top/bottom ordering of J-pop & K-pop CPD words)
+that beats the tf-idf baseline ('table/tfidf.txt') by more than margin, by running
+the clustering directly instead of reading the 'table/ari_*.csv' results.
+
+for each case, a coarse grid of n (coarse_step, 2*coarse_step, ...) is evaluated
+until n beats the baseline; the exact n is then found by bisection between the
+last failing and the first beating grid point, assuming the clustering performance
+does not fall below the threshold again within that interval.
+
+n below min_n (coarse_step by default) is never evaluated: with a handful of words,
+most lyrics are dropped and the clustering performance is mostly noise, which the
+bisection could mistake for the smallest n beating the baseline.
+
+this evaluates far fewer n than a sweep with a step of 1.
+
+returns (n_words, label_jpop, label_kpop), or None if no setting beats the baseline.
+
+'''
+
+def search_setting(margin=0.0, coarse_step=100, max_n=1000, min_n=None):
+    if min_n is None:
+        min_n = coarse_step
+
+    with open("table/tfidf.txt", "r") as f:
+        threshold = float(f.read()) + margin
+
+    corpus = cooccur.count_corpus()
+    vocab, counts, label_all = corpus['vocab'], corpus['counts'], corpus['label']
+
+    ja, ko, neu = common_func.load_word_list()
+
+    ranks = {'t': (word_rank(vocab, ja), word_rank(vocab, ko)),
+             'b': (word_rank(vocab, list(reversed(ja))), word_rank(vocab, list(reversed(ko))))}
+
+    best = None
+    for case in ["tt", "tb", "bt", "bb"]:
+        rank_ja = ranks[case[0]][0]
+        rank_ko = ranks[case[1]][1]
+        scores = {}
+
+        def beats(n):
+            if n not in scores:
+                vect, label = tfidf_matrix(counts, label_all, (rank_ja < n) | (rank_ko < n))
+                km = KMeans(n_clusters=2, random_state=0)
+                scores[n] = adjusted_rand_score(km.fit_predict(vect), label)
+                print("case={}, n={}: ARI={:.5f}".format(case, n, scores[n]))
+            return scores[n] > threshold
+
+        # Coarse search; n beyond the best n found so far need not be evaluated.
+
+        limit = max_n if best is None else best[0]
+        lo, hi = 0, None
+        for n in range(coarse_step, limit + coarse_step, coarse_step):
+            n = min(max(n, min_n), limit)
+            if beats(n):
+                hi = n
+                break
+            lo = n
+
+        if hi is None:
+            continue
+
+        # Fine search by bisection: lo fails (or is below min_n), hi beats the baseline.
+
+        lo = max(lo, min_n - 1)
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if beats(mid):
+                hi = mid
+            else:
+                lo = mid
+
+        if best is None or hi < best[0]:
+            best = (hi, case, scores[hi])
+
+    if best is None:
+        print("no setting beats the baseline by {}.".format(margin))
+        return None
+
+    n_words, case, ari = best
+    print("searched setting: n={}, ja={}, ko={} (ARI={:.5f})".format(n_words, case[0], case[1], ari))
+
+    return n_words, case[0], case[1]
+
+
 # Execute the below functions in a sequential manner.
 
 #---------------------------------------
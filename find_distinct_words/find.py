@@ -27,6 +27,8 @@ The following arguments should be specified:
 --- label_kpop : /'top' or 'bottom'/ the method that returned the best 
                  K-pop clustering performance based on the  
                  'fig/clustering_performance.png'.
+
+--- open_browser : /bool/ if False, the html results are saved but not opened in the browser.
 '''
 
 '''
@@ -39,7 +41,7 @@ load filtered J-pop & K-pop lyrics data.
 
 '''
 
-def distinct_words(n_words, label_jpop, label_kpop):
+def distinct_words(n_words, label_jpop, label_kpop, open_browser=True):
     # Create 'result' directory if there isn't any.
 
     result_dir = "result"
@@ -62,10 +64,10 @@ def distinct_words(n_words, label_jpop, label_kpop):
     rev_ko = list(reversed(ko))
     rev_ja = list(reversed(ja))
 
-    if sort_label_ko is 'b':
+    if sort_label_ko == 'b':
         ko = rev_ko
 
-    if sort_label_ja is 'b':
+    if sort_label_ja == 'b':
         ja = rev_ja
 
     print("--------------------------------------------------------")
@@ -192,7 +194,7 @@ def distinct_words(n_words, label_jpop, label_kpop):
     common_func.save_distinct_words_ko(list(u_ja_sans), "j_pop")
 
     # Output top-10/top-20 results in web browser.
-    sort_freq.summary_ko()
+    sort_freq.summary_ko(open_browser)
 
     # Save results in Japanese.
 
@@ -201,7 +203,7 @@ def distinct_words(n_words, label_jpop, label_kpop):
     common_func.save_distinct_words_ja(list(u_ja_sans), "j_pop")
 
     # Output top-10/top-20 results in web browser.
-    sort_freq.summary_ja()
+    sort_freq.summary_ja(open_browser)
 
 
     # Based on CPD word list.
@@ -231,7 +233,8 @@ def distinct_words(n_words, label_jpop, label_kpop):
         file.write(html_korean)
 
     path = 'file:///home/hcilab/Documents/OSS/playnview_distinctwordfinder/find_distinct_words/result/result_korean.html'
-    webbrowser.get(using='google-chrome').open(path)
+    if open_browser:
+        webbrowser.get(using='google-chrome').open(path)
 
     df_japanese = df_japanese.where((pd.notnull(df_japanese)), None)
     html_japanese = tabulate(df_japanese, headers='keys', tablefmt='html', showindex=False)
@@ -240,7 +243,8 @@ def distinct_words(n_words, label_jpop, label_kpop):
         file.write(html_japanese)
 
     path = 'file:///home/hcilab/Documents/OSS/playnview_distinctwordfinder/find_distinct_words/result/result_japanese.html'
-    webbrowser.get(using='google-chrome').open(path)
+    if open_browser:
+        webbrowser.get(using='google-chrome').open(path)
 
 
 
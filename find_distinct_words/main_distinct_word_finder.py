@@ -3,6 +3,10 @@ from find_distinct_words import build
 from find_distinct_words import experiment
 from find_distinct_words import find
 from find_distinct_words import review
+from find_distinct_words import cache
+from find_distinct_words import common_func
+import argparse
+import os
 import time
 
 '''
@@ -10,7 +14,7 @@ import time
 # Author: Heeryon Cho <heeryon.cho@gmail.com>
 # License: BSD-3-clause
 
-This code executes the steps required for finding the 
+This code executes the steps required for finding the
 K-pop/J-pop distinct lyrics words.
 
 The steps are carried out as follows:
@@ -23,94 +27,339 @@ The steps are carried out as follows:
 
 4. find: distinct lyrics words are found using the 'sorting method' and 'n' argument.
 
+5. review: (optional) reviews the data statistics used in the application.
+
 This code assumes that K-pop/J-pop lyrics texts are already available.
- 
+
+Steps 1-3 are cached (see 'cache.py'): a step is skipped when its input files
+and parameters are unchanged since the last run, so re-running the code after
+changing only the 'find' arguments does not redo the tokenize/train/decompose cycle.
+
+Each step can be run separately as a subcommand, and 'all' runs every step:
+
+$ PYTHONHASHSEED=0 python3 main_distinct_word_finder.py all --auto --no-show --no-browser
+$ PYTHONHASHSEED=0 python3 main_distinct_word_finder.py find --auto search --margin 0.05 --no-browser
+$ PYTHONHASHSEED=0 python3 main_distinct_word_finder.py find --n-words 500 --j-pop b --k-pop t
+
+Run a subcommand with '--help' to list its arguments. Without a subcommand,
+all steps are run and the user is asked for the 'find' arguments after the
+line graph is shown (the original interactive mode).
+
 '''
 
+# Filtered lyrics data files (see 'common_func.save_corpus()').
+
+FILTERED_LYRICS = common_func.corpus_files("filtered_lyrics/lyrics_ja") + \
+                  common_func.corpus_files("filtered_lyrics/lyrics_ko")
+
 #-----------------------------------------------
 # STEP 1. PREPROCESS
 #-----------------------------------------------
 
-# Where the lyrics text files are saved.
+def run_preprocess(args):
+    # Tokenize J-pop/K-pop lyrics data.
 
-lyrics_ja = "../crawl_data/lyrics_jp/jp_lyrics_verbose.csv"
-lyrics_ko = "../crawl_data/lyrics_kr/kr_lyrics_verbose.csv"
+    if args.stream:
+        tokenize_ja, tokenize_ko = preprocess.stream_tokenize_ja, preprocess.stream_tokenize_ko
+    else:
+        tokenize_ja, tokenize_ko = preprocess.tokenize_ja, preprocess.tokenize_ko
 
-# Tokenize J-pop/K-pop lyrics data.
+    word_list_ja = common_func.corpus_files("processed/word_list_ja")
+    word_list_ko = common_func.corpus_files("processed/word_list_ko")
 
-preprocess.tokenize_ja(lyrics_ja)
-preprocess.tokenize_ko(lyrics_ko)
+    cache.run_stage("tokenize_ja", tokenize_ja,
+                    inputs=[args.lyrics_ja, "stopwords/stopwords-ja.txt"],
+                    outputs=word_list_ja + ["processed/uniq_word_ja.txt"],
+                    params={'lyrics_file_ja': args.lyrics_ja}, n_jobs=args.tokenize_jobs)
+    cache.run_stage("tokenize_ko", tokenize_ko,
+                    inputs=[args.lyrics_ko],
+                    outputs=word_list_ko + ["processed/uniq_word_ko.txt"],
+                    params={'lyrics_file_ko': args.lyrics_ko}, n_jobs=args.tokenize_jobs)
 
-# Check the content of the J-pop/K-pop lyrics word alignment dictionary.
+    # Check the content of the J-pop/K-pop lyrics word alignment dictionary.
 
-preprocess.check_dictionary()
+    cache.run_stage("check_dictionary", preprocess.check_dictionary,
+                    inputs=["dictionary/ja2ko_aligned_dict_final.csv",
+                            "processed/uniq_word_ja.txt", "processed/uniq_word_ko.txt"],
+                    outputs=["dictionary/ja2ko_dict.p", "dictionary/index_words.txt"])
 
-# Filter J-pop/K-pop lyrics data using the alignment dictionary.
+    # Filter J-pop/K-pop lyrics data using the alignment dictionary.
 
-preprocess.filter_lyrics()
+    cache.run_stage("filter_lyrics", preprocess.filter_lyrics,
+                    inputs=["dictionary/ja2ko_dict.p", "dictionary/index_words.txt"] + word_list_ja + word_list_ko,
+                    outputs=FILTERED_LYRICS)
 
 
 #-----------------------------------------------
 # STEP 2. BUILD
 #-----------------------------------------------
 
-# Build j-pop/k-pop word2vec vectors and CPD word list (fixed mode-3 value CP decomposition).
-# Note that 10 different seeds are used to generate 10 different
-# word2vector j-pop/k-pop pairs and CP decomposition word lists.
-
-build.W2V_n_CPD_wordlist()
+def run_build(args):
+    # Build j-pop/k-pop word2vec vectors and CPD word list (fixed mode-3 value CP decomposition).
+    # Note that n_seeds different seeds (10 by default) are used to generate n_seeds different
+    # word2vector j-pop/k-pop pairs and CP decomposition word lists.
+    # The number of worker processes does not change the result, so it is not part of the cache key.
+    # One word list is saved for each component of the corpora (e.g., 'ja', 'neu', 'ko').
+    # The word vectors of corpora other than ja/ko are not built, but read from 'word2vec'.
+
+    components = build._components(args.corpora)
+    outputs = ["cpd_result/{}.txt".format(c) for c in components]
+    for c in components:
+        outputs += common_func.ranking_files("cpd_result/" + c)
+
+    inputs = ["dictionary/index_words.txt"] + FILTERED_LYRICS
+    inputs += [path for c in args.corpora if c not in ("ja", "ko") for seed in range(args.n_seeds)
+               for path in build.vector_files(c, seed, args.embedding) if os.path.exists(path)]
+
+    # The warm-started decompositions start from the factors of the previous build,
+    # which are thus inputs too (and change with every build).
+
+    if args.warm_start:
+        factor_files = ["cpd_result/factors_{}.npz".format(seed) for seed in range(args.n_seeds)]
+        inputs += [path for path in factor_files if os.path.exists(path)]
+
+    cache.run_stage("build", build.W2V_n_CPD_wordlist,
+                    inputs=inputs,
+                    outputs=outputs,
+                    params={'n_seeds': args.n_seeds, 'size': args.size, 'w_jako': args.w_jako,
+                            'engine': args.engine, 'constrained': args.constrained, 'batched': args.batched,
+                            'warm_start': args.warm_start, 'rank_stable': args.rank_stable,
+                            'rank_top': args.rank_top, 'block_rows': args.block_rows,
+                            'w2v_workers': args.w2v_workers, 'embedding': args.embedding, 'corpora': args.corpora},
+                    n_jobs=args.n_jobs, verify_seeds=args.verify_seeds)
 
 
 #-----------------------------------------------
 # STEP 3. EXPERIMENT
 #-----------------------------------------------
 
-# Calculate the baseline performance of tfidf using all filtered words (i.e., 1,007 index words).
+def run_experiment(args):
+    # Calculate the baseline performance of tfidf using all filtered words (i.e., 1,007 index words).
+
+    cache.run_stage("baseline", experiment.baseline,
+                    inputs=FILTERED_LYRICS,
+                    outputs=["table/tfidf.txt"])
 
-experiment.baseline()
+    # Calculate the top_n X top_n, top_n X bottom_n, bottom_n X top_n, bottom_n X bottom_n,
+    # J-pop X K-pop CPD lyrics word clustering performance using K-means clustering.
+    # The number of worker processes does not change the result, so it is not part of the cache key.
 
-# Calculate the top_n X top_n, top_n X bottom_n, bottom_n X top_n, bottom_n X bottom_n,
-# J-pop X K-pop CPD lyrics word clustering performance using K-means clustering.
+    cases = ["tt", "tb", "bt", "bb"]
 
-experiment.top_x_bottom()
+    cache.run_stage("top_x_bottom", experiment.top_x_bottom,
+                    inputs=FILTERED_LYRICS + ["cpd_result/ja.txt", "cpd_result/ko.txt", "cpd_result/neu.txt"],
+                    outputs=["table/ari_{}.csv".format(c) for c in cases] +
+                            ["table/num_words_{}.csv".format(c) for c in cases] + ["table/top_n.csv"],
+                    params={'step': args.step, 'max_n': args.max_n},
+                    n_jobs=args.experiment_jobs)
 
-print("\n============================================")
-print("|   You will see a graph pop up.           |")
-print("|   Please determine the word size and     |")
-print("|   top/bottom ordering of 'ja' and 'ko'   |")
-print("|   words. You need to close the graph     |")
-print("|   window to continue.                    |")
-print("============================================\n")
+    if args.show:
+        print("\n============================================")
+        print("|   You will see a graph pop up.           |")
+        print("|   Please determine the word size and     |")
+        print("|   top/bottom ordering of 'ja' and 'ko'   |")
+        print("|   words. You need to close the graph     |")
+        print("|   window to continue.                    |")
+        print("============================================\n")
 
-time.sleep(1)
+        time.sleep(1)
 
-# Draw a line graph of the experimental results and show it to the user.
+    # Draw a line graph of the experimental results and (optionally) show it to the user.
+
+    experiment.draw_line_graph(show_graph=args.show)
 
-experiment.draw_line_graph()
 
 #-----------------------------------------------
 # STEP 4. FIND
 #-----------------------------------------------
 
-# Based on the 'fig/clustering_performance.png', the user determines
-# the size of n (integer) and
-# the lyrics word sorting method (string: either 'top' or 'bottom') for each of the J-pop & K-pop.
+def run_find(args):
+    # Based on the 'fig/clustering_performance.png', the user determines
+    # the size of n (integer) and
+    # the lyrics word sorting method (string: either 'top' or 'bottom') for each of the J-pop & K-pop.
+    # In the automatic mode, these are picked either from the 'table/ari_*.csv' results
+    # ('best': best ARI, 'smallest': smallest n beating the baseline by the margin)
+    # or by searching n directly ('search'). If no n beats the baseline, 'best' is used.
+
+    setting = None
+    if args.auto == 'smallest':
+        setting = experiment.smallest_setting(margin=args.margin)
+    if args.auto == 'search':
+        setting = experiment.search_setting(margin=args.margin, coarse_step=args.coarse_step, max_n=args.max_n,
+                                             min_n=args.min_n)
 
-# Ask the user, the number of words, up/bottom decision of 'ja' and 'ko' words.
+    if args.auto is not None and setting is None:
+        setting = experiment.best_setting()
 
-n_words = input("Number of words?: ")
-j_pop = input("J-pop (ja): top or bottom? Type 't' or 'b': ")
-k_pop = input("K-pop (ko): top or bottom? Type 't' or 'b': ")
+    if setting is not None:
+        n_words, j_pop, k_pop = setting
+    else:
+        # Ask the user, the number of words, up/bottom decision of 'ja' and 'ko' words,
+        # unless they were given as arguments.
 
+        n_words = args.n_words
+        j_pop = args.j_pop
+        k_pop = args.k_pop
 
-# The list of distinct words are saved under the 'result' directory.
+        if n_words is None:
+            n_words = int(input("Number of words?: "))
+        if j_pop is None:
+            j_pop = input("J-pop (ja): top or bottom? Type 't' or 'b': ")
+        if k_pop is None:
+            k_pop = input("K-pop (ko): top or bottom? Type 't' or 'b': ")
 
-find.distinct_words(int(n_words), j_pop, k_pop)
-#find.distinct_words(500, 'b', 't')
+    # The list of distinct words are saved under the 'result' directory.
 
+    find.distinct_words(n_words, j_pop, k_pop, open_browser=args.browser)
 
-#=====================================================================================================
-# Optionally, the user can review the data statistics used in the application using the below function.
 
-review.data_statistics()
+#-----------------------------------------------
+# STEP 5. REVIEW
+#-----------------------------------------------
+
+def run_review(args):
+    # Optionally, the user can review the data statistics used in the application.
+
+    review.data_statistics()
+
+
+def run_all(args):
+    run_preprocess(args)
+    run_build(args)
+    run_experiment(args)
+    run_find(args)
+    run_review(args)
+
+
+'''
+
+|++++++++++++++|
+| get_parser() |
+|++++++++++++++|
+
+builds the command line parser with one subcommand per step and 'all'.
+
+'''
 
+def get_parser():
+    # Arguments of each step; 'all' accepts the arguments of every step.
+
+    preprocess_args = argparse.ArgumentParser(add_help=False)
+    preprocess_args.add_argument("--lyrics-ja", default="../crawl_data/lyrics_jp/jp_lyrics_verbose.csv",
+                                 help="J-pop lyrics csv file")
+    preprocess_args.add_argument("--lyrics-ko", default="../crawl_data/lyrics_kr/kr_lyrics_verbose.csv",
+                                 help="K-pop lyrics csv file")
+    preprocess_args.add_argument("--tokenize-jobs", type=int, default=1,
+                                 help="number of worker processes for the tokenization")
+    preprocess_args.add_argument("--stream", action="store_true",
+                                 help="tokenize without holding the lyrics in memory")
+
+    build_args = argparse.ArgumentParser(add_help=False)
+    build_args.add_argument("--n-seeds", type=int, default=10,
+                            help="number of word2vec/CPD seeds")
+    build_args.add_argument("--n-jobs", type=int, default=1,
+                            help="number of worker processes for the seeds")
+    build_args.add_argument("--size", type=int, default=5,
+                            help="dimensionality of the word vectors")
+    build_args.add_argument("--w-jako", type=float, default=0.5,
+                            help="mode-3 weight of the J-pop/K-pop components")
+    build_args.add_argument("--engine", choices=["numpy", "tensorly", "cp_als"], default="numpy",
+                            help="CP decomposition code (see 'build.CPD_wordlist()')")
+    build_args.add_argument("--constrained", action="store_true",
+                            help="do not update the fixed mode-3 factor in the CP decomposition "
+                                 "(same word lists; see 'build.check_constrained()')")
+    build_args.add_argument("--batched", action="store_true",
+                            help="compute the CP decompositions of all seeds at once; "
+                                 "requires --engine cp_als (see 'cp_als.parafac_batch()')")
+    build_args.add_argument("--warm-start", action="store_true",
+                            help="start the CP decompositions from the factors of the previous build")
+    build_args.add_argument("--rank-stable", type=int, default=None, metavar="K",
+                            help="stop a CP decomposition once the top & bottom words of its components "
+                                 "are unchanged for K iterations")
+    build_args.add_argument("--rank-top", type=int, default=50, metavar="N",
+                            help="number of top (& bottom) words of each component compared by --rank-stable")
+    build_args.add_argument("--block-rows", type=int, default=None, metavar="N",
+                            help="memory-map the word2vec vectors and decompose them N words at a time")
+    build_args.add_argument("--embedding", choices=["w2v", "ppmi"], default="w2v",
+                            help="word vectors of the CP decomposition: word2vec or PPMI-SVD (see 'ppmi.py')")
+    build_args.add_argument("--corpora", nargs="+", default=["ja", "ko"], metavar="CORPUS",
+                            help="corpora decomposed together; the word vectors of corpora other than "
+                                 "ja/ko must already be in 'word2vec' (see 'build.CPD_wordlist()')")
+    build_args.add_argument("--w2v-workers", type=int, default=1, metavar="N",
+                            help="number of word2vec training threads (not reproducible if N > 1)")
+    build_args.add_argument("--verify-seeds", type=int, default=1, metavar="K",
+                            help="with --w2v-workers N > 1, check the built word lists of the first K seeds "
+                                 "against single-threaded word2vec and fail the build if they "
+                                 "are not stable (see 'build.check_workers()')")
+
+    sweep_args = argparse.ArgumentParser(add_help=False)
+    sweep_args.add_argument("--step", type=int, default=50,
+                            help="step of the n words sweep")
+    sweep_args.add_argument("--max-n", type=int, default=1000,
+                            help="largest n words of the sweep")
+
+    experiment_args = argparse.ArgumentParser(add_help=False)
+    experiment_args.add_argument("--no-show", dest="show", action="store_false",
+                                 help="save the line graph without showing it")
+    experiment_args.add_argument("--experiment-jobs", type=int, default=1, metavar="N",
+                                 help="number of worker processes for the n words sweep")
+
+    find_args = argparse.ArgumentParser(add_help=False)
+    find_args.add_argument("--n-words", type=int,
+                           help="number of J-pop/K-pop CPD words")
+    find_args.add_argument("--j-pop", choices=['t', 'b'],
+                           help="top ('t') or bottom ('b') J-pop CPD words")
+    find_args.add_argument("--k-pop", choices=['t', 'b'],
+                           help="top ('t') or bottom ('b') K-pop CPD words")
+    find_args.add_argument("--auto", nargs='?', const='best', choices=['best', 'smallest', 'search'],
+                           help="pick n words and top/bottom automatically: best ARI in 'table/ari_*.csv' "
+                                "(best, default), smallest n beating the baseline in 'table/ari_*.csv' "
+                                "(smallest), or smallest n found by a coarse-to-fine search (search)")
+    find_args.add_argument("--margin", type=float, default=0.0,
+                           help="ARI margin over the tf-idf baseline for --auto smallest/search")
+    find_args.add_argument("--coarse-step", type=int, default=100,
+                           help="coarse grid step of --auto search")
+    find_args.add_argument("--min-n", type=int, default=None,
+                           help="smallest n evaluated by --auto search (default: --coarse-step)")
+    find_args.add_argument("--no-browser", dest="browser", action="store_false",
+                           help="save the html results without opening them in the browser")
+
+    parser = argparse.ArgumentParser(description="Finds distinct K-pop/J-pop lyrics words.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("preprocess", parents=[preprocess_args],
+                          help="tokenize and filter the lyrics").set_defaults(func=run_preprocess)
+    subparsers.add_parser("build", parents=[build_args],
+                          help="build word2vec vectors and CPD word lists").set_defaults(func=run_build)
+    subparsers.add_parser("experiment", parents=[sweep_args, experiment_args],
+                          help="run the n words clustering sweep").set_defaults(func=run_experiment)
+    subparsers.add_parser("find", parents=[sweep_args, find_args],
+                          help="find the distinct words").set_defaults(func=run_find)
+    subparsers.add_parser("review", help="review the data statistics").set_defaults(func=run_review)
+    subparsers.add_parser("all", parents=[preprocess_args, build_args, sweep_args, experiment_args, find_args],
+                          help="run all steps").set_defaults(func=run_all)
+
+    return parser
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+
+    # Without a subcommand, run all steps interactively.
+
+    if args.command is None:
+        args = parser.parse_args(["all"])
+
+    # Build options that cannot be combined are rejected before any step is run.
+
+    if getattr(args, 'batched', False) and args.engine != 'cp_als':
+        parser.error("--batched requires --engine cp_als")
+    if getattr(args, 'batched', False) and args.rank_stable:
+        parser.error("--rank-stable is not available with --batched")
+
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
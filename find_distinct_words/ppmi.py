@@ -0,0 +1,98 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import svds
+
+'''
+
+# Author: Heeryon Cho <heeryon.cho@gmail.com>
+# License: BSD-3-clause
+
+This code builds count-based word vectors, an alternative to the word2vec vectors
+of 'build.word2vec()':
+
+1. the words that co-occur within a window in the lyrics are counted (see 'cooccur.py'),
+
+2. the counts are turned into a positive pointwise mutual information (PPMI) matrix, and
+
+3. the PPMI matrix is factored with a truncated singular value decomposition (SVD).
+
+The J-pop & K-pop vectors are the PPMI matrices of the J-pop & K-pop lyrics projected
+onto the same singular vectors of the PPMI matrix of all lyrics, so that their
+dimensions are comparable (as the word2vec models that start from the same model).
+Unlike word2vec, the vectors are deterministic.
+
+--- ppmi_matrix(counts, alpha) : computes the PPMI matrix of co-occurrence counts.
+--- ppmi_vectors(cooccurrences, size, alpha, random_state) : builds the PPMI-SVD word vectors of corpora.
+
+'''
+
+
+'''
+
+|++++++++++++++++++++++++++++|
+| ppmi_matrix(counts, alpha) |
+|++++++++++++++++++++++++++++|
+
+computes the positive pointwise mutual information of co-occurrence counts,
+
+    PPMI(w, c) = max(log(P(w, c) / (P(w) P_alpha(c))), 0)
+
+where the context probabilities are smoothed with the exponent alpha (0.75 as in word2vec).
+
+returns a sparse matrix.
+
+'''
+
+def ppmi_matrix(counts, alpha=0.75):
+    counts = sparse.coo_matrix(counts)
+    total = counts.sum()
+
+    p_w = np.asarray(counts.sum(axis=1)).ravel() / total
+    c_alpha = np.asarray(counts.sum(axis=0)).ravel() ** alpha
+    p_c = c_alpha / c_alpha.sum()
+
+    pmi = np.log(counts.data / total / (p_w[counts.row] * p_c[counts.col]))
+    keep = pmi > 0
+
+    return sparse.csr_matrix((pmi[keep], (counts.row[keep], counts.col[keep])), shape=counts.shape)
+
+
+'''
+
+|++++++++++++++++++++++++++++++++++++++++++++++++++++++++|
+| ppmi_vectors(cooccurrences, size, alpha, random_state) |
+|++++++++++++++++++++++++++++++++++++++++++++++++++++++++|
+
+builds the PPMI-SVD word vectors of several corpora with the same vocabulary.
+
+--- cooccurrences : list of the co-occurrence count matrices of each corpus
+                    (e.g., those of the J-pop & K-pop lyrics, see 'cooccur.count_corpus()').
+--- size : dimensionality of the word vectors.
+--- alpha : context distribution smoothing of the PPMI (see 'ppmi_matrix()').
+--- random_state : seed of the starting vector of the SVD solver.
+
+returns the list of (n_words x size) float32 word vectors of each corpus.
+
+'''
+
+def ppmi_vectors(cooccurrences, size=5, alpha=0.75, random_state=2018):
+    # Right singular vectors of the PPMI matrix of all lyrics, whose co-occurrence counts
+    # are the sum of those of the corpora. Their signs are fixed so that the largest
+    # component of each vector is positive.
+
+    merged = ppmi_matrix(sum(cooccurrences), alpha=alpha)
+    v0 = np.random.RandomState(random_state).random_sample(min(merged.shape))
+    u, s, vt = svds(merged, k=size, v0=v0)
+    order = np.argsort(-s)
+    s, vt = s[order], vt[order]
+    vt *= np.sign(vt[np.arange(size), np.argmax(np.abs(vt), axis=1)])[:, np.newaxis]
+
+    # Project the PPMI matrix of each corpus onto the singular vectors, weighting the
+    # dimensions by the square roots of the singular values (U sqrt(S) for all lyrics).
+
+    vectors = []
+    for c in cooccurrences:
+        projected = ppmi_matrix(c, alpha=alpha).dot(vt.T) / np.sqrt(s)
+        vectors.append(projected.astype(np.float32))
+
+    return vectors
@@ -5,6 +5,9 @@ from konlpy.tag import Mecab
 import re
 import pickle
 from collections import Counter
+from itertools import islice
+from multiprocessing import Pool
+from find_distinct_words import common_func
 
 '''
 
@@ -37,17 +40,114 @@ See 'check_dictionary()' function.
 '''
 
 
+# Japanese morphological analyzer options.
+
+NEOLOGD = "-Ochasen -d /usr/lib/mecab/dic/mecab-ipadic-neologd"
+
+# Korean stopwords.
+
+STOPWORDS_KO = ["하:VV", "있:VV", "되:VV", "있:VA", "이러:VV"]
+
+# Per-process state of the tokenizer workers.
+# These variables are only set by the _init_tokenizer_ja() & _init_tokenizer_ko() functions below,
+# so that each worker process creates its morphological analyzer once.
+
+_tagger = None
+_stopwords = None
+
+
+def _init_tokenizer_ja(stopwords):
+    global _tagger, _stopwords
+
+    # Load Japanese morphological analyzer.
+
+    _tagger = MeCab.Tagger(NEOLOGD)
+    _stopwords = set(stopwords)
+
+
+def _tokenize_chunk_ja(data):
+    word_list = []
+    for lyric in data:
+        # Remove English words.
+        lyric = re.sub('[a-zA-z]', '', lyric)
+        tmp = []
+        _tagger.parse('')
+        lex = _tagger.parseToNode(re.sub('\u3000', ' ', lyric))
+        while lex:
+            # The node features are parsed once; 'BOS/EOS' nodes (beginning and
+            # ending of a sentence) have none of the selected parts of speech.
+            feature = lex.feature.split(',')
+            pos = feature[0]
+            if (pos == '名詞') | (pos == '動詞') | (pos == '形容詞'):
+                # If 'base' word exists, use 'base' word; otherwise use 'surface' word.
+                base = feature[-3]
+                if (not base == '*') & (base not in _stopwords):
+                    tmp.append("{}:{}".format(base, pos))
+                elif (lex.surface not in _stopwords):
+                    tmp.append("{}:{}".format(lex.surface, pos))
+            lex = lex.next
+        word_list.append(tmp)
+    return word_list
+
+
+def _init_tokenizer_ko():
+    global _tagger, _stopwords
+
+    # Load Korean morphological analyzer.
+
+    _tagger = Mecab()
+    _stopwords = set(STOPWORDS_KO)
+
+
+def _tokenize_chunk_ko(data):
+    morphs = []
+    for lyric in data:
+        lyric = re.sub('[a-zA-z]', '', lyric)
+        parsed = _tagger.pos(lyric)
+        tmp = []
+        for w, pos in parsed:
+            # We look for four parts of speech
+            # See below URL for POS tags (Mecab-ko)
+            # *** KoNLPy Korean POS Tag Comparison Chart ***
+            # https://docs.google.com/spreadsheets/d/1OGAjUvalBuX-oZvZ_-9tEfYD2gQe7hTGsgUpiiBSXI8/edit#gid=0
+            if (pos == 'NNG') | (pos == 'NNP') | (pos == 'VV') | (pos == 'VA'):
+                wpos = "{}:{}".format(w, pos)
+                if wpos not in _stopwords:
+                    tmp.append(wpos)
+        morphs.append(tmp)
+    return morphs
+
+
+def _tokenize(data, initializer, initargs, tokenize_chunk, n_jobs, chunksize):
+    # Split the lyrics into chunks; the chunks are tokenized by n_jobs worker
+    # processes and merged back in their original order.
+
+    chunks = [data[i:i + chunksize] for i in range(0, len(data), chunksize)]
+
+    if n_jobs == 1:
+        initializer(*initargs)
+        tokenized = map(tokenize_chunk, chunks)
+        return [words for chunk in tokenized for words in chunk]
+
+    with Pool(processes=n_jobs, initializer=initializer, initargs=initargs) as pool:
+        tokenized = pool.imap(tokenize_chunk, chunks)
+        return [words for chunk in tokenized for words in chunk]
+
+
 '''
 
-|++++++++++++++++++++++++++|
-| tokenize_ja(lyrics_file) |
-|++++++++++++++++++++++++++|
+|+++++++++++++++++++++++++++++++++++++++++++++|
+| tokenize_ja(lyrics_file, n_jobs, chunksize) |
+|+++++++++++++++++++++++++++++++++++++++++++++|
 
 tokenizes J-pop lyrics data by extracting nouns, verbs and adjectives.
 
+if n_jobs > 1, chunks of chunksize lyrics are tokenized by n_jobs worker
+processes, each with its own morphological analyzer.
+
 '''
 
-def tokenize_ja(lyrics_file_ja):
+def tokenize_ja(lyrics_file_ja, n_jobs=1, chunksize=100):
     print("\n-------- J-POP LYRICS --------")
 
     # lyrics_file_ja = ../crawl_data/lyrics_jp/jp_lyrics_verbose.csv
@@ -67,42 +167,7 @@ def tokenize_ja(lyrics_file_ja):
         stopwords = f.read()
         stopwords = stopwords.split("\n")
 
-    # Load Japanese morphological analyzer.
-
-    NEOLOGD = "-Ochasen -d /usr/lib/mecab/dic/mecab-ipadic-neologd"
-    m = MeCab.Tagger(NEOLOGD)
-
-    lines = []
-    for lyric in data:
-        # Remove English words.
-        lyric = re.sub('[a-zA-z]', '', lyric)
-        morph = []
-        m.parse('')
-        lex = m.parseToNode(re.sub('\u3000', ' ', lyric))
-        while lex:
-            # Insert tokens to dictionary
-            tmp = {}
-            tmp['surface'] = lex.surface
-            tmp['base'] = lex.feature.split(',')[-3]  # base
-            tmp['pos'] = lex.feature.split(',')[0]  # pos
-            tmp['pos1'] = lex.feature.split(',')[1]  # pos1
-            # Beginning and ending of a sentence are no included.
-            if 'BOS/EOS' not in tmp['pos']:
-                morph.append(tmp)
-            lex = lex.next
-        lines.append(morph)
-
-    # If 'base' word exists, use 'base' word; otherwise use 'surface' word.
-    word_list = []
-    for line in lines:
-        tmp = []
-        for morph in line:
-            if (morph['pos'] == '名詞') | (morph['pos'] == '動詞') | (morph['pos'] == '形容詞'):
-                if (not morph['base'] == '*') & (morph['base'] not in stopwords):
-                    tmp.append("{}:{}".format(morph['base'], morph['pos']))
-                elif (morph['surface'] not in stopwords):
-                    tmp.append("{}:{}".format(morph['surface'], morph['pos']))
-        word_list.append(tmp)
+    word_list = _tokenize(data, _init_tokenizer_ja, (stopwords,), _tokenize_chunk_ja, n_jobs, chunksize)
 
     # Create 'processed' directory if there isn't any.
 
@@ -111,9 +176,9 @@ def tokenize_ja(lyrics_file_ja):
         os.makedirs(processed_dir)
 
     # Save tokenized lyrics, which contains nouns, verbs, and adjectives, to file.
+    # (See 'common_func.save_corpus()' for the file format.)
 
-    with open("processed/word_list_ja.p", 'wb') as f:
-        pickle.dump(word_list, f)
+    common_func.save_corpus("processed/word_list_ja", word_list)
 
     flat_list = [item for sublist in word_list for item in sublist]
     print("total_ja_words:", len(flat_list))
@@ -129,16 +194,19 @@ def tokenize_ja(lyrics_file_ja):
 
 '''
 
-|++++++++++++++++++++++++++|
-| tokenize_ko(lyrics_file) |
-|++++++++++++++++++++++++++|
+|+++++++++++++++++++++++++++++++++++++++++++++|
+| tokenize_ko(lyrics_file, n_jobs, chunksize) |
+|+++++++++++++++++++++++++++++++++++++++++++++|
 
 tokenizes K-pop lyrics data by extracting 
 nouns (common noun & proper noun), verbs and adjectives.
 
+if n_jobs > 1, chunks of chunksize lyrics are tokenized by n_jobs worker
+processes, each with its own morphological analyzer.
+
 '''
 
-def tokenize_ko(lyrics_file_ko):
+def tokenize_ko(lyrics_file_ko, n_jobs=1, chunksize=100):
     print("\n-------- K-POP LYRICS --------")
 
     # lyrics_file_ko = "../crawl_data/lyrics_kr/kr_lyrics_verbose.csv"
@@ -152,29 +220,7 @@ def tokenize_ko(lyrics_file_ko):
     data = list(df['Lyrics'].values)
     print("ko num of lyrics:", len(data))
 
-    # Load Korean stopwords.
-
-    stopwords = ["하:VV", "있:VV", "되:VV", "있:VA", "이러:VV"]
-
-    # Load Korean morphological analyzer.
-
-    mecab = Mecab()
-
-    morphs = []
-    for lyric in data:
-        lyric = re.sub('[a-zA-z]', '', lyric)
-        parsed = mecab.pos(lyric)
-        tmp = []
-        for w, pos in parsed:
-            # We look for four parts of speech
-            # See below URL for POS tags (Mecab-ko)
-            # *** KoNLPy Korean POS Tag Comparison Chart ***
-            # https://docs.google.com/spreadsheets/d/1OGAjUvalBuX-oZvZ_-9tEfYD2gQe7hTGsgUpiiBSXI8/edit#gid=0
-            if (pos == 'NNG') | (pos == 'NNP') | (pos == 'VV') | (pos == 'VA'):
-                wpos = "{}:{}".format(w, pos)
-                if wpos not in stopwords:
-                    tmp.append(wpos)
-        morphs.append(tmp)
+    morphs = _tokenize(data, _init_tokenizer_ko, (), _tokenize_chunk_ko, n_jobs, chunksize)
 
     # Create 'processed' directory if there isn't any.
 
@@ -182,8 +228,7 @@ def tokenize_ko(lyrics_file_ko):
     if not os.path.exists(processed_dir):
         os.makedirs(processed_dir)
 
-    with open("processed/word_list_ko.p", 'wb') as f:
-        pickle.dump(morphs, f)
+    common_func.save_corpus("processed/word_list_ko", morphs)
 
     flat_list = [item for sublist in morphs for item in sublist]
     print("total_ko_words:", len(flat_list))
@@ -196,6 +241,137 @@ def tokenize_ko(lyrics_file_ko):
             f.write("{}\t{}\n".format(k, v))
 
 
+def _read_lyrics(lyrics_file, chunksize):
+    # Read the lyrics csv file in chunks of chunksize rows, and drop the rows with
+    # missing values and the duplicate rows (rows are compared by their hash values).
+    # All columns are read as strings, since the hash of a value depends on its dtype,
+    # which could differ between chunks (e.g., int vs. float if a chunk has a missing value).
+
+    seen = set()
+    for df in pd.read_csv(lyrics_file, chunksize=chunksize, dtype=str):
+        df = df.dropna()
+        lyrics = []
+        for row_hash, lyric in zip(pd.util.hash_pandas_object(df, index=False).values, df['Lyrics'].values):
+            if row_hash not in seen:
+                seen.add(row_hash)
+                lyrics.append(lyric)
+        yield lyrics
+
+
+def _stream_tokenize(lyrics_file, lang, initializer, initargs, tokenize_chunk, n_jobs, chunksize):
+    # Create 'processed' directory if there isn't any.
+
+    processed_dir = "processed"
+    if not os.path.exists(processed_dir):
+        os.makedirs(processed_dir)
+
+    chunks = _read_lyrics(lyrics_file, chunksize)
+
+    # The pool is terminated even if the tokenization or the saving fails.
+
+    pool = None
+    try:
+        if n_jobs == 1:
+            initializer(*initargs)
+            tokenized = map(tokenize_chunk, chunks)
+        else:
+            pool = Pool(processes=n_jobs, initializer=initializer, initargs=initargs)
+
+            # Only a few chunks per worker are read ahead of the tokenization.
+
+            def tokenize_batches():
+                while True:
+                    batch = list(islice(chunks, 4 * n_jobs))
+                    if not batch:
+                        break
+                    for word_list in pool.imap(tokenize_chunk, batch):
+                        yield word_list
+
+            tokenized = tokenize_batches()
+
+        # Append the tokenized lyrics to file and count the words on the fly.
+
+        counts = Counter()
+
+        def counted_lyrics():
+            for word_list in tokenized:
+                for words in word_list:
+                    counts.update(words)
+                    yield words
+
+        n_lyrics = common_func.save_corpus("processed/word_list_{}".format(lang), counted_lyrics())
+
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    print("num. of lyrics_{}:".format(lang), n_lyrics)
+    print("total_{}_words:".format(lang), sum(counts.values()))
+    print("uniq_words_{}:".format(lang), len(counts))
+
+    # Save unique word list with frequency to file.
+
+    with open("processed/uniq_word_{}.txt".format(lang), 'w') as f:
+        for k, v in counts.most_common():
+            f.write("{}\t{}\n".format(k, v))
+
+
+'''
+
+|++++++++++++++++++++++++++++++++++++++++++++++++++++|
+| stream_tokenize_ja(lyrics_file, n_jobs, chunksize) |
+|++++++++++++++++++++++++++++++++++++++++++++++++++++|
+
+tokenizes J-pop lyrics data like 'tokenize_ja()', without holding the whole
+lyrics csv file or the tokenized lyrics in memory.
+
+the csv file is read in chunks of chunksize rows, and the tokenized lyrics are
+appended to the 'processed/word_list_ja.{vocab,ids,offsets}' files one by one.
+'processed/uniq_word_ja.txt' is counted on the fly.
+
+to drop the duplicate rows across chunks, the 64-bit hash of each distinct row is kept
+(see '_read_lyrics()'), so the memory still grows with the number of distinct lyrics,
+though by one hash per row rather than by the size of the lyrics.
+
+'''
+
+def stream_tokenize_ja(lyrics_file_ja, n_jobs=1, chunksize=500):
+    print("\n-------- J-POP LYRICS (STREAM) --------")
+
+    # Load Japanese stopwords.
+
+    with open('stopwords/stopwords-ja.txt', 'r') as f:
+        stopwords = f.read()
+        stopwords = stopwords.split("\n")
+
+    _stream_tokenize(lyrics_file_ja, "ja", _init_tokenizer_ja, (stopwords,), _tokenize_chunk_ja,
+                     n_jobs, chunksize)
+
+
+'''
+
+|++++++++++++++++++++++++++++++++++++++++++++++++++++|
+| stream_tokenize_ko(lyrics_file, n_jobs, chunksize) |
+|++++++++++++++++++++++++++++++++++++++++++++++++++++|
+
+tokenizes K-pop lyrics data like 'tokenize_ko()', without holding the whole
+lyrics csv file or the tokenized lyrics in memory.
+
+the tokenized lyrics are appended to the 'processed/word_list_ko.{vocab,ids,offsets}'
+files one by one (see 'stream_tokenize_ja()').
+
+'''
+
+def stream_tokenize_ko(lyrics_file_ko, n_jobs=1, chunksize=500):
+    print("\n-------- K-POP LYRICS (STREAM) --------")
+
+    _stream_tokenize(lyrics_file_ko, "ko", _init_tokenizer_ko, (), _tokenize_chunk_ko,
+                     n_jobs, chunksize)
+
+
 '''
 
 |++++++++++++++++++++|
@@ -204,6 +380,9 @@ def tokenize_ko(lyrics_file_ko):
 
 checks the content of the manually created J-pop/K-pop lyrics word alignment dictionary.
 
+saves the ja-ko dictionary ('dictionary/ja2ko_dict.p') and its index words
+('dictionary/index_words.txt', see 'common_func.save_index_words()').
+
 '''
 
 def check_dictionary():
@@ -265,6 +444,11 @@ def check_dictionary():
     with open("dictionary/ja2ko_dict.p", 'wb') as f:
        pickle.dump(jako_dict, f)
 
+    # Save the index words (the Korean words of the ja-ko dictionary), whose line
+    # numbers are the vocabulary IDs used by the later steps.
+
+    common_func.save_index_words(jako_dict.values())
+
 
 
 '''
@@ -279,10 +463,15 @@ filters the lyrics data using the following 3 files:
 2. 'processed/uniq_word_ja.txt' file
 3. 'processed/uniq_word_ko.txt' file
 
+the tokenized lyrics are read from 'processed/word_list_{ja,ko}.{vocab,ids,offsets}'
+(or from the older 'processed/word_list_{ja,ko}.p' files).
+
 the output files are:
 
-1. "filtered_lyrics/lyrics_ja.p"
-2. "filtered_lyrics/lyrics_ko.p"
+1. "filtered_lyrics/lyrics_ja.{vocab,ids,offsets}"
+2. "filtered_lyrics/lyrics_ko.{vocab,ids,offsets}"
+
+the vocabulary of both files is the list of index words (see 'common_func.load_index_words()').
 
 the filtered lyrics data contain index words listed in the 
 J-pop/K-pop lyrics word alignment dictionary 
@@ -305,7 +494,7 @@ def filter_lyrics():
 
     # Split grouped Korean words.
 
-    ko_list = list(jako_dict.values())
+    ko_list = common_func.load_index_words()
     ko_hash = {}
     for ko in ko_list:
         if "|" in ko:
@@ -317,11 +506,8 @@ def filter_lyrics():
 
     # Read K-pop lyrics data.
 
-    with open("processed/word_list_ko.p", 'rb') as f:
-        ko_lyrics = pickle.load(f)
-
     ko_filtered = []
-    for each_lyric in ko_lyrics:
+    for each_lyric in common_func.iter_tokenized("ko"):
         tmp = []
         for w in each_lyric:
             if w in ko_hash:
@@ -335,15 +521,10 @@ def filter_lyrics():
 
     # Save filtered_ko lyrics:
 
-    with open("filtered_lyrics/lyrics_ko.p", 'wb') as f:
-        pickle.dump(ko_filtered, f)
+    common_func.save_corpus("filtered_lyrics/lyrics_ko", ko_filtered, vocab=ko_list)
 
     # Read J-pop lyrics data.
 
-    with open("processed/word_list_ja.p", 'rb') as f:
-        ja_lyrics = pickle.load(f)
-
-
     ja_list = list(jako_dict.keys())
     ja_hash = {}
     for ja in ja_list:
@@ -355,7 +536,7 @@ def filter_lyrics():
             ja_hash[ja] = ja
 
     ja_filtered = []
-    for each_lyric in ja_lyrics:
+    for each_lyric in common_func.iter_tokenized("ja"):
         tmp = []
         for w in each_lyric:
             if w in ja_hash:
@@ -369,8 +550,7 @@ def filter_lyrics():
 
     # Save filtered_ja lyrics:
     # *** Note that Japanese lyrics words are mapped to Korean word tokes. ***
-    with open("filtered_lyrics/lyrics_ja.p", 'wb') as f:
-        pickle.dump(ja_filtered, f)
+    common_func.save_corpus("filtered_lyrics/lyrics_ja", ja_filtered, vocab=ko_list)
 
     # Merge filtered_ja & filtered_ko lyrics
     filtered = ja_filtered + ko_filtered
@@ -1,5 +1,7 @@
 import pickle
 import numpy as np
+from find_distinct_words import common_func
+from find_distinct_words import cooccur
 
 '''
 
@@ -22,12 +24,10 @@ reviews the statics of the lyrics data and the coverage of the distinct words.
 
 
 def data_statistics():
-    with open("processed/word_list_ko.p", 'rb') as f:
-        raw_lyrics_ko = pickle.load(f)
+    raw_lyrics_ko = list(common_func.iter_tokenized("ko"))
     print("\n# or raw lyrics (KO):", len(raw_lyrics_ko))
 
-    with open("processed/word_list_ja.p", 'rb') as f:
-        raw_lyrics_ja = pickle.load(f)
+    raw_lyrics_ja = list(common_func.iter_tokenized("ja"))
     print("# or raw lyrics (JA):", len(raw_lyrics_ja))
 
     print("sample of raw lyrics (KO):", raw_lyrics_ko[0][:3])
@@ -89,68 +89,62 @@ def data_statistics():
         len(lengths_ko_raw_verbose), len(lengths_ja_raw_verbose), len(lengths_ko_raw_uniq), len(lengths_ja_raw_uniq)
     ))
 
-    with open("filtered_lyrics/lyrics_ko.p", 'rb') as f:
-        lyrics_ko = pickle.load(f)
-    print("# of filtered lyrics (KO):", len(lyrics_ko))
+    # The statistics of the filtered lyrics are computed from their document-term counts
+    # (see 'cooccur.count_corpus()'), e.g., the POS tags are checked once per vocabulary word.
 
-    with open("filtered_lyrics/lyrics_ja.p", 'rb') as f:
-        lyrics_ja = pickle.load(f)
-    print("# of filtered lyrics (JA):", len(lyrics_ja))
+    corpus = cooccur.count_corpus()
+    vocab, tokens, offsets, counts = corpus['vocab'], corpus['tokens'], corpus['offsets'], corpus['counts']
+    is_ko = corpus['label'] == 0
+    is_ja = corpus['label'] == 1
 
-    lengths_ko_verbose = [len(i) for i in lyrics_ko]
-    lengths_ja_verbose = [len(i) for i in lyrics_ja]
-    print("sample of filtered lyrics (KO):", lyrics_ko[0][:3])
-    print("sample of filtered lyrics (JA):", lyrics_ja[0][:3])
+    print("# of filtered lyrics (KO):", int(is_ko.sum()))
+    print("# of filtered lyrics (JA):", int(is_ja.sum()))
 
-    print("\n# all words *filtered* verbose (KO):", sum(lengths_ko_verbose))
-    print("# all words *filtered* verbose (JA):", sum(lengths_ja_verbose))
+    lengths_verbose = np.diff(offsets)
+    lengths_ko_verbose = lengths_verbose[is_ko]
+    lengths_ja_verbose = lengths_verbose[is_ja]
+
+    first_ko = offsets[np.flatnonzero(is_ko)[0]]
+    first_ja = offsets[np.flatnonzero(is_ja)[0]]
+    print("sample of filtered lyrics (KO):", list(vocab[tokens[first_ko:first_ko + 3]]))
+    print("sample of filtered lyrics (JA):", list(vocab[tokens[first_ja:first_ja + 3]]))
+
+    print("\n# all words *filtered* verbose (KO):", int(lengths_ko_verbose.sum()))
+    print("# all words *filtered* verbose (JA):", int(lengths_ja_verbose.sum()))
 
     print("avg. word length *filtered* verbose (KO):",
-          round(float(sum(lengths_ko_verbose)) / len(lengths_ko_verbose), 2))
+          round(float(lengths_ko_verbose.sum()) / len(lengths_ko_verbose), 2))
     print("avg. word length *filtered* verbose (JA):",
-          round(float(sum(lengths_ja_verbose)) / len(lengths_ja_verbose), 2))
+          round(float(lengths_ja_verbose.sum()) / len(lengths_ja_verbose), 2))
 
-    lengths_ko_uniq = [len(set(i)) for i in lyrics_ko]
-    lengths_ja_uniq = [len(set(i)) for i in lyrics_ja]
+    lengths_uniq = np.diff(counts.indptr)
+    lengths_ko_uniq = lengths_uniq[is_ko]
+    lengths_ja_uniq = lengths_uniq[is_ja]
 
-    print("\n# all words *filtered* unique (KO):", sum(lengths_ko_uniq))
-    print("# all words *filtered* unique (JA):", sum(lengths_ja_uniq))
+    print("\n# all words *filtered* unique (KO):", int(lengths_ko_uniq.sum()))
+    print("# all words *filtered* unique (JA):", int(lengths_ja_uniq.sum()))
 
-    print("avg. word length *filtered* uniq (KO):", round(float(sum(lengths_ko_uniq)) / len(lengths_ko_uniq), 2))
-    print("avg. word length *filtered* uniq (JA):", round(float(sum(lengths_ja_uniq)) / len(lengths_ja_uniq), 2))
+    print("avg. word length *filtered* uniq (KO):", round(float(lengths_ko_uniq.sum()) / len(lengths_ko_uniq), 2))
+    print("avg. word length *filtered* uniq (JA):", round(float(lengths_ja_uniq.sum()) / len(lengths_ja_uniq), 2))
 
-    ko_noun = []
-    ko_verb = []
-    ko_adj = []
-    for lyric in lyrics_ko:
-        for word in lyric:
-            if (":NNG" in word) or (":NNP" in word):
-                ko_noun.append(word)
-            if ":VV" in word:
-                ko_verb.append(word)
-            if ":VA" in word:
-                ko_adj.append(word)
+    # Occurrences of each vocabulary word in the K-pop & J-pop lyrics.
+
+    word_counts_ko = np.asarray(counts[is_ko].sum(axis=0)).ravel()
+    word_counts_ja = np.asarray(counts[is_ja].sum(axis=0)).ravel()
 
-    print("\n# *filtered* nouns (KO):", len(ko_noun))
-    print("# *filtered* verbs (KO):", len(ko_verb))
-    print("# *filtered* adjectives (KO):", len(ko_adj))
+    is_noun = np.array([(":NNG" in w) or (":NNP" in w) for w in vocab])
+    is_verb = np.array([":VV" in w for w in vocab])
+    is_adj = np.array([":VA" in w for w in vocab])
+
+    print("\n# *filtered* nouns (KO):", int(word_counts_ko[is_noun].sum()))
+    print("# *filtered* verbs (KO):", int(word_counts_ko[is_verb].sum()))
+    print("# *filtered* adjectives (KO):", int(word_counts_ko[is_adj].sum()))
 
     # Note that the filtered_lyrics_ja contain Japanese --> Korean mapping of J-pop lyrics.
-    ja_noun = []
-    ja_verb = []
-    ja_adj = []
-    for lyric in lyrics_ja:
-        for word in lyric:
-            if (":NNG" in word) or (":NNP" in word):
-                ja_noun.append(word)
-            if ":VV" in word:
-                ja_verb.append(word)
-            if ":VA" in word:
-                ja_adj.append(word)
 
-    print("\n# *filtered* nouns (JA):", len(ja_noun))
-    print("# *filtered* verbs (JA):", len(ja_verb))
-    print("# *filtered* adjectives (JA):", len(ja_adj))
+    print("\n# *filtered* nouns (JA):", int(word_counts_ja[is_noun].sum()))
+    print("# *filtered* verbs (JA):", int(word_counts_ja[is_verb].sum()))
+    print("# *filtered* adjectives (JA):", int(word_counts_ja[is_adj].sum()))
 
     print("\n--- flt_v_ko: {}, flt_v_ja: {}, flt_uniq_ko: {}, flt_uniq_ja: {}\n".format(
         len(lengths_ko_verbose), len(lengths_ja_verbose), len(lengths_ko_uniq), len(lengths_ja_uniq)
@@ -158,14 +152,14 @@ def data_statistics():
 
     print("\n--- COVERAGE IN % ---\n")
     print("filtered_words/all_words_raw (%) (KO):",
-          round(float(sum(lengths_ko_verbose)) / sum(lengths_ko_raw_verbose), 5))
+          round(float(lengths_ko_verbose.sum()) / sum(lengths_ko_raw_verbose), 5))
     print("filtered_words/all_words_raw (%) (JA):",
-          round(float(sum(lengths_ja_verbose)) / sum(lengths_ja_raw_verbose), 5))
+          round(float(lengths_ja_verbose.sum()) / sum(lengths_ja_raw_verbose), 5))
 
     print("filtered_words_uniq/all_words_raw_uniq (%) (KO):",
-          round(float(sum(lengths_ko_uniq)) / sum(lengths_ko_raw_uniq), 5))
+          round(float(lengths_ko_uniq.sum()) / sum(lengths_ko_raw_uniq), 5))
     print("filtered_words_uniq/all_words_raw_uniq (%) (JA):",
-          round(float(sum(lengths_ja_uniq)) / sum(lengths_ja_raw_uniq), 5))
+          round(float(lengths_ja_uniq.sum()) / sum(lengths_ja_raw_uniq), 5))
 
     print("\n--- COVERAGE OF DISTINCT WORDS ---")
 
@@ -176,27 +170,13 @@ def data_statistics():
 
     print("\nSize of distinct words (KO):", len(distinct))
 
-    coverage_distinct_ko = []
-    for lyric in lyrics_ko:
-        counter = 0
-        init_length = len(lyric)
-        for w in lyric:
-            if w in distinct:
-                counter += 1
-        coverage_distinct_ko.append(float(counter) / init_length)
-
-    print("Coverage of distinct words in filtered lyrics K-pop:", round(np.mean(np.array(coverage_distinct_ko)), 5))
-
-    coverage_distinct_ja = []
-    for lyric in lyrics_ja:
-        counter = 0
-        init_length = len(lyric)
-        for w in lyric:
-            if w in distinct:
-                counter += 1
-        coverage_distinct_ja.append(float(counter) / init_length)
-
-    print("Coverage of distinct words in filtered lyrics J-pop:", round(np.mean(np.array(coverage_distinct_ja)), 5))
+    # Fraction of the words of each lyric that are distinct words.
+
+    is_distinct = np.array([w in distinct for w in vocab], dtype=np.float64)
+    coverage_distinct = counts.dot(is_distinct) / lengths_verbose
+
+    print("Coverage of distinct words in filtered lyrics K-pop:", round(np.mean(coverage_distinct[is_ko]), 5))
+    print("Coverage of distinct words in filtered lyrics J-pop:", round(np.mean(coverage_distinct[is_ja]), 5))
 
     print("\n------------------------------------\n")
 
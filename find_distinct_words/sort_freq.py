@@ -21,9 +21,11 @@ given country's lyrics data (from large fequency to small).
 
 - Comparison of top-20 K-pop, J-pop and Common verbs. 
 
+Set open_browser=False to only save the html files (e.g., on a headless machine).
+
 '''
 
-def summary_ko():
+def summary_ko(open_browser=True):
     top_n = 30
     noun_ja = pd.read_csv("result_ko/distinct_j_pop_NNG.csv", header=None)
     noun_ja = noun_ja.iloc[:top_n, 0].str.replace(':NNG', '')
@@ -63,11 +65,12 @@ def summary_ko():
         file.write(html)
 
     path = 'file:///home/hcilab/Documents/OSS/playnview_distinctwordfinder/find_distinct_words/result_ko/result_ko_freq_considered.html'
-    webbrowser.get(using='google-chrome').open(path)
+    if open_browser:
+        webbrowser.get(using='google-chrome').open(path)
 
 #summary_ko()
 
-def summary_ja():
+def summary_ja(open_browser=True):
     top_n = 30
     noun_ja = pd.read_csv("result_ja/distinct_j_pop_noun.csv", header=None)
     noun_ja = noun_ja.iloc[:top_n, 0].str.replace(':名詞', '')
@@ -107,6 +110,7 @@ def summary_ja():
         file.write(html)
 
     path = 'file:///home/hcilab/Documents/OSS/playnview_distinctwordfinder/find_distinct_words/result_ja/result_ja_freq_considered.html'
-    webbrowser.get(using='google-chrome').open(path)
+    if open_browser:
+        webbrowser.get(using='google-chrome').open(path)
 
 #summary_ja()
\ No newline at end of file
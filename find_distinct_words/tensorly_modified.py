@@ -59,7 +59,19 @@ DAMAGE.
 
 
 Japanese, Neutral, Korean words can be set using
-'fixed_ja' & 'fixed_ko' variables.
+the 'mode_three_val' argument.
+
+2. Added the 'constrained' option. If all the mode-3 values are fixed, the
+   mode-3 factor is treated as a constant and its least-squares update
+   (which is overwritten by the fixed values anyway) is skipped. The
+   reconstruction error is still that of the least-squares mode-3 factor,
+   so the iterations stop as in the original decomposition.
+
+3. Added the 'init' option, which starts the decomposition from given
+   factors (e.g., the factors of a previous run) instead of random factors.
+
+4. 'mode_three_val' may have any number of rows (one per corpus), e.g., the
+   rows generated by 'cp_als.fixed_mode_three()' for more than two corpora.
 
 '''
 
@@ -99,7 +111,7 @@ def initialize_factors(tensor, rank, random_state=None, non_negative=False):
 
 def parafac(tensor, rank, n_iter_max=100, tol=1e-8,
             random_state=None, verbose=False, return_errors=False,
-            mode_three_val=[[0.5, 0.5, 0.0],[0.0, 0.5, 0.5]]):
+            mode_three_val=[[0.5, 0.5, 0.0],[0.0, 0.5, 0.5]], constrained=False, init=None):
     """CANDECOMP/PARAFAC decomposition via alternating least squares (ALS)
 
     Computes a rank-`rank` decomposition of `tensor` [1]_ such that,
@@ -122,6 +134,15 @@ def parafac(tensor, rank, n_iter_max=100, tol=1e-8,
         Level of verbosity
     return_errors : bool, optional
         Activate return of iteration errors
+    mode_three_val : list
+        Fixed rows of the mode-3 factor
+    constrained : bool, optional
+        If True, the fixed mode-3 rows are set once and kept in the
+        returned factors, and the mode-3 update is skipped when all
+        the mode-3 rows are fixed; the reconstruction error uses the
+        least-squares mode-3 factor as without `constrained`
+    init : ndarray list, optional
+        Initial factors; if None, the factors are initialized using `random_state`
 
 
     Returns
@@ -138,22 +159,32 @@ def parafac(tensor, rank, n_iter_max=100, tol=1e-8,
        SIAM REVIEW, vol. 51, n. 3, pp. 455-500, 2009.
     """
 
-    factors = initialize_factors(tensor, rank, random_state=random_state)
+    if init is None:
+        factors = initialize_factors(tensor, rank, random_state=random_state)
+    else:
+        factors = [tl.tensor(np.array(f), **tl.context(tensor)) for f in init]
     rec_errors = []
     norm_tensor = tl.norm(tensor, 2)
 
     # Mode-3 values that control the country factors are set using the
     # mode_three_val argument.
 
-    fixed_ja = mode_three_val[0]
-    fixed_ko = mode_three_val[1]
+    def set_mode_three_values():
+        for k, fixed_k in enumerate(mode_three_val):
+            factors[2][k] = fixed_k
+
+    modes = list(range(tl.ndim(tensor)))
+    if constrained:
+        set_mode_three_values()   # set mode-3 values
+        if len(mode_three_val) == tensor.shape[2]:
+            modes.remove(2)
 
     for iteration in range(n_iter_max):
-        for mode in range(tl.ndim(tensor)):
+        for mode in modes:
             pseudo_inverse = tl.tensor(np.ones((rank, rank)), **tl.context(tensor))
 
-            factors[2][0] = fixed_ja   # set mode-3 values
-            factors[2][1] = fixed_ko   # set mode-3 values
+            if not constrained:
+                set_mode_three_values()   # set mode-3 values
 
             for i, factor in enumerate(factors):
                 if i != mode:
@@ -162,8 +193,23 @@ def parafac(tensor, rank, n_iter_max=100, tol=1e-8,
             factor = tl.transpose(tl.solve(tl.transpose(pseudo_inverse), tl.transpose(factor)))
             factors[mode] = factor
 
+            if constrained and mode == 2:
+                set_mode_three_values()   # set mode-3 values
+
         if tol:
-            rec_error = tl.norm(tensor - kruskal_to_tensor(factors), 2) / norm_tensor
+            # In the constrained mode, the least-squares mode-3 factor is computed
+            # for the reconstruction error but not kept.
+
+            rec_factors = factors
+            if constrained:
+                pseudo_inverse = tl.tensor(np.ones((rank, rank)), **tl.context(tensor))
+                for factor in factors[:2]:
+                    pseudo_inverse = pseudo_inverse*tl.dot(tl.transpose(factor), factor)
+                factor = tl.dot(unfold(tensor, 2), khatri_rao(factors, skip_matrix=2))
+                factor = tl.transpose(tl.solve(tl.transpose(pseudo_inverse), tl.transpose(factor)))
+                rec_factors = factors[:2] + [factor]
+
+            rec_error = tl.norm(tensor - kruskal_to_tensor(rec_factors), 2) / norm_tensor
             rec_errors.append(rec_error)
 
             if iteration > 1:
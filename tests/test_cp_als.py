@@ -0,0 +1,60 @@
+import numpy as np
+from find_distinct_words import cp_als
+
+
+def _synthetic_tensor(n_words=200, size=5, random_state=0):
+    # A (n_words x size x 2) tensor, like the stacked J-pop & K-pop word vectors.
+
+    rng = np.random.RandomState(random_state)
+    shared = rng.normal(size=(n_words, size))
+    return np.stack([shared + 0.5 * rng.normal(size=(n_words, size)),
+                     shared + 0.5 * rng.normal(size=(n_words, size))], axis=2)
+
+
+def test_constrained_same_rankings():
+    # With the default tolerance of the build, the constrained ALS (which does not update
+    # the fixed mode-3 factor) stops at the same iteration as the original ALS of the
+    # 'numpy' engine (error='direct') and gives the same word rankings of each component.
+    # (This tensor converges within n_iter_max, where the stopping iteration matters.)
+
+    X = _synthetic_tensor(n_words=100)
+    country_values = cp_als.fixed_mode_three(2, 0.5)
+
+    for error in ('direct', 'gram'):
+        original, errors_original = cp_als.parafac(X, 3, random_state=2018, n_iter_max=300,
+                                                   mode_three_val=country_values, error=error,
+                                                   return_errors=True)
+        constrained, errors_constrained = cp_als.parafac(X, 3, random_state=2018, n_iter_max=300,
+                                                         mode_three_val=country_values, error=error,
+                                                         return_errors=True, constrained=True)
+
+        assert len(errors_original) < 300
+        assert len(errors_original) == len(errors_constrained)
+
+        rank_original = np.argsort(-np.asarray(original[0]), axis=0, kind='stable')
+        rank_constrained = np.argsort(-np.asarray(constrained[0]), axis=0, kind='stable')
+        assert np.array_equal(rank_original, rank_constrained)
+        assert np.array_equal(constrained[2], country_values)
+
+
+def test_blocked_rows_same_factors():
+    # Gathering the rows of each block from the slices gives the same factors
+    # as decomposing the gathered slices.
+
+    X = _synthetic_tensor()
+    country_values = cp_als.fixed_mode_three(2, 0.5)
+
+    # The first slice is stored in shuffled row order; 'rows' restores the order of X.
+
+    slices = [np.ascontiguousarray(X[:, :, k]) for k in range(2)]
+    perm = np.random.RandomState(1).permutation(len(X))
+    shuffled = [slices[0][perm], slices[1]]
+    rows = [np.argsort(perm), None]
+
+    gathered = cp_als.parafac_blocked(slices, 3, block_rows=64, random_state=2018,
+                                      n_iter_max=50, mode_three_val=country_values)
+    blocked = cp_als.parafac_blocked(shuffled, 3, block_rows=64, random_state=2018,
+                                     n_iter_max=50, mode_three_val=country_values, rows=rows)
+
+    for f_gathered, f_blocked in zip(gathered, blocked):
+        assert np.array_equal(f_gathered, f_blocked)